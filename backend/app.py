@@ -9,8 +9,13 @@ import click
 from flask.cli import with_appcontext
 from seed_data import seed_data
 from datetime import timedelta
+import time
+from services.nlp_utils import warmup_nlp, rss_mb
+from services.clause_matcher import get_indice_clausulas, get_matriz_clausulas
+from services.generation_service import precompilar_plantillas
 
 def create_app():
+    inicio = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
 
@@ -36,6 +41,15 @@ def create_app():
         seed_data()
         click.echo("Base de datos inicializada y datos cargados correctamente.")
 
+    # El modelo spaCy se carga en el primer uso; NLP_WARMUP lo adelanta al arranque
+    if app.config.get("NLP_WARMUP") and warmup_nlp():
+        get_indice_clausulas()
+        get_matriz_clausulas()
+
+    if app.config.get("JINJA_WARMUP"):
+        precompilar_plantillas()
+
+    print(f"App iniciada en {time.perf_counter() - inicio:.2f}s (RSS {rss_mb():.0f} MB).")
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+"""
+Servidor ASGI para el streaming del chat.
+
+El endpoint /chat/streaming se atiende con asyncio: la lógica de
+conversación (procesar el mensaje y guardar en la BBDD) corre en un
+executor acotado y la respuesta se envía con generadores asíncronos,
+así que un stream abierto no retiene ningún hilo. El resto de rutas
+sigue siendo la app Flask de siempre, montada como WSGI.
+
+Uso:
+    uvicorn asgi:app --workers 2
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import create_app
+from models import Usuario
+from services.chat_service import (
+    responder_mensaje, obtener_o_crear_chat, astream_response, astream_sse
+)
+
+# Mismos encabezados que aplica flask_cors a las rutas WSGI
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Authorization, Content-Type, Accept",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+}
+
+
+def create_asgi_app(flask_app=None):
+    flask_app = flask_app or create_app()
+    config = flask_app.config
+    executor = ThreadPoolExecutor(
+        max_workers=config["ASGI_EXECUTOR_WORKERS"],
+        thread_name_prefix="chat-estado"
+    )
+
+    def _responder(api_key, data):
+        """Se ejecuta en el executor, dentro del contexto de la app Flask."""
+        with flask_app.app_context():
+            usuario = Usuario.query.filter_by(api_key=api_key).first() if api_key else None
+            if not usuario:
+                return None
+            chat_id = obtener_o_crear_chat(usuario.id, data.get("chat_id"), data.get("nombre"))
+            return responder_mensaje(chat_id, data["mensaje"], usuario.id)
+
+    async def chat_streaming(request):
+        if request.method == "OPTIONS":
+            return Response(status_code=200, headers=CORS_HEADERS)
+
+        auth_header = request.headers.get("Authorization", "")
+        api_key = auth_header.split(" ")[1] if auth_header.startswith("Bearer ") else None
+        if not api_key:
+            return JSONResponse({"error": "No autorizado"}, status_code=401, headers=CORS_HEADERS)
+
+        data = await request.json()
+        if not data.get("mensaje"):
+            return JSONResponse({"error": "Mensaje no proporcionado"}, status_code=400, headers=CORS_HEADERS)
+
+        loop = asyncio.get_running_loop()
+        respuesta = await loop.run_in_executor(executor, _responder, api_key, data)
+        if respuesta is None:
+            return JSONResponse({"error": "No autorizado"}, status_code=401, headers=CORS_HEADERS)
+
+        formato = request.query_params.get("formato")
+        if formato not in ("sse", "texto"):
+            accept = request.headers.get("Accept", "")
+            formato = "sse" if "text/event-stream" in accept else config["CHAT_STREAM_FORMATO"]
+
+        if formato == "sse":
+            eventos = astream_sse(
+                respuesta,
+                modo=request.query_params.get("modo", config["CHAT_STREAM_MODO"]),
+                pausa_ms=config["CHAT_STREAM_PAUSA_MS"],
+            )
+            return StreamingResponse(eventos, media_type="text/event-stream", headers={
+                **CORS_HEADERS,
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            })
+
+        # Compatibilidad text/plain: la pausa por caracter es cooperativa
+        return StreamingResponse(
+            astream_response(respuesta, config["CHAT_STREAM_TEXTO_DELAY"]),
+            media_type="text/plain",
+            headers=CORS_HEADERS
+        )
+
+    return Starlette(
+        routes=[
+            Route("/chat/streaming", chat_streaming, methods=["POST", "OPTIONS"]),
+            Mount("/", app=WSGIMiddleware(flask_app)),
+        ],
+        on_shutdown=[lambda: executor.shutdown(wait=False)],
+    )
+
+
+app = create_asgi_app()
@@ -0,0 +1,110 @@
+# benchmarks/bench_detector.py
+"""
+Detección del tipo de contrato antes y después de services.contract_detector.
+
+  - antes:   la búsqueda original de chat_service: recorrer CONTRACTS en
+             orden y devolver el primer tipo con algún término contenido
+             en el mensaje (subcadena, con tildes y sin límites de palabra).
+  - despues: DetectorTipoContrato (Aho-Corasick, palabras completas, gana
+             el término más específico).
+
+Frases base: "Quiero un contrato de <término>" para cada clave y sinónimo
+del catálogo, más las respuestas típicas del primer mensaje. Se comprueba
+que ambas versiones den el mismo tipo. Aparte, con el tipo esperado, los
+casos de frases compuestas y límites de palabra ("ventana" no es "venta").
+
+Uso (desde backend/):
+    python benchmarks/bench_detector.py --repeticiones 2000
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from data.contracts_data import CONTRACTS  # noqa: E402
+from services.contract_detector import DetectorTipoContrato  # noqa: E402
+
+FRASES_TIPICAS = [
+    "Hola, necesito un contrato de arrendamiento para mi departamento",
+    "Quiero alquilar mi casa en Sullana",
+    "Necesito un contrato de prestación de servicios",
+    "Voy a vender mi auto, quiero un contrato de compraventa",
+    "Le voy a prestar dinero a mi primo",
+    "Quiero un contrato de comodato para prestar mi camioneta",
+    "Necesito una carta poder para que mi hermano cobre",
+    "Quiero un acuerdo de confidencialidad (NDA) con un proveedor",
+    "Un contrato de franquicia para mi restaurante",
+    "Contrato de trabajo para una asistente",
+]
+
+# (frase, tipo esperado)
+CORRECCIONES = [
+    ("Quiero un contrato de préstamo de uso", "comodato"),
+    ("Necesito un contrato de servicio de marketing", "prestacion_servicios"),
+    ("Quiero cambiar la ventana de mi local", None),
+    ("Necesito un contrato de reconocimiento de deuda", "reconocimiento_deuda"),
+    ("Redacta un contrato de trabajo", "trabajo_privado"),
+    ("Contrato de préstamo de dinero", "mutuo"),
+]
+
+
+def antes_detectar(texto):
+    if not texto:
+        return None
+    texto_lower = texto.lower()
+    for tipo, info in CONTRACTS.items():
+        terminos_de_busqueda = [tipo.replace('_', ' ')] + info.get("sinonimos", [])
+        for termino in terminos_de_busqueda:
+            if termino.lower() in texto_lower:
+                return tipo
+    return None
+
+
+def frases_base():
+    frases = []
+    for tipo, info in CONTRACTS.items():
+        for termino in [tipo.replace("_", " ")] + info.get("sinonimos", []):
+            frases.append(f"Quiero un contrato de {termino}")
+    return frases + FRASES_TIPICAS
+
+
+def medir(funcion, frases, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for frase in frases:
+            funcion(frase)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) / len(frases)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Detección del tipo de contrato antes/después")
+    arg_parser.add_argument("--repeticiones", type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    detector = DetectorTipoContrato(CONTRACTS)
+    despues_detectar = detector.detectar
+    base = frases_base()
+
+    distintas = [(f, antes_detectar(f), despues_detectar(f)) for f in base
+                 if antes_detectar(f) != despues_detectar(f)]
+    print(f"Frases base: {len(base)}, iguales: {len(base) - len(distintas)}, distintas: {len(distintas)}")
+    for frase, antes, despues in distintas:
+        print(f"  DISTINTO  {frase!r}: antes {antes}, después {despues}")
+
+    print()
+    print(f"{'frase':<50} {'antes':<22} {'después':<22} esperado")
+    for frase, esperado in CORRECCIONES:
+        despues = despues_detectar(frase)
+        marca = "" if despues == esperado else "  <- FALLA"
+        print(f"{frase:<50} {str(antes_detectar(frase)):<22} {str(despues):<22} {esperado}{marca}")
+
+    print()
+    frases = base + [f for f, _ in CORRECCIONES]
+    t_antes = medir(antes_detectar, frases, args.repeticiones)
+    t_despues = medir(despues_detectar, frases, args.repeticiones)
+    print(f"Por frase: antes {t_antes * 1e6:.1f} µs, después {t_despues * 1e6:.1f} µs")
@@ -0,0 +1,125 @@
+# benchmarks/bench_estados.py
+"""
+Microbenchmark de la máquina de estados del chat: mensajes por segundo.
+
+Recorre una conversación completa por cada tipo de contrato (detección
+del tipo, todas las preguntas, resumen, confirmaciones y cláusulas) y
+mide el costo de CPU por turno. Dos modos:
+
+  - transicion: solo ejecutar_transicion (el despacho y los handlers).
+  - responder:  responder_mensaje con la BBDD sustituida por objetos en
+                memoria (sin sesión ni commit reales), para ver el costo
+                del turno completo sin la latencia de PostgreSQL.
+
+Uso (desde backend/):
+    python benchmarks/bench_estados.py --segundos 3
+"""
+import os
+import sys
+import time
+import argparse
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from data.contracts_data import CONTRACTS  # noqa: E402
+from services import chat_service  # noqa: E402
+
+
+def conversacion(tipo):
+    """Mensajes del usuario para llevar un chat de 'inicio' a 'generando_contrato'."""
+    info = CONTRACTS[tipo]
+    mensajes = [f"Quiero un contrato de {info['sinonimos'][0]}"]
+    mensajes += [f"Respuesta de prueba {i} para {p['key']}" for i, p in enumerate(info["preguntas"])]
+    mensajes += [
+        "sí",  # mostrar resumen
+        "sí",  # confirmar datos
+        "sí",  # agregar cláusulas
+        "El arrendatario no podrá subarrendar el inmueble sin autorización escrita.",
+        "no",  # no más cláusulas
+    ]
+    return mensajes
+
+
+def _conversaciones():
+    resultado = []
+    for tipo in CONTRACTS:
+        mensajes = conversacion(tipo)
+        detectado = chat_service.detectar_tipo_contrato(mensajes[0])
+        if detectado != tipo:
+            print(f"⚠️ '{mensajes[0]}' se detecta como {detectado}, se omite {tipo}.")
+            continue
+        resultado.append(mensajes)
+    return resultado
+
+
+def bench_transicion(conversaciones, segundos):
+    total = 0
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        for mensajes in conversaciones:
+            contexto = {}
+            for texto in mensajes:
+                chat_service.ejecutar_transicion(contexto, texto)
+            assert contexto["estado"] == "generando_contrato", contexto.get("estado")
+            total += len(mensajes)
+    return total, time.perf_counter() - inicio
+
+
+class _ChatEnMemoria:
+    def __init__(self):
+        self.metadatos = {}
+
+
+class _Sesion:
+    def add(self, objeto):
+        pass
+
+    def commit(self):
+        pass
+
+
+class _Mensaje:
+    def __init__(self, **campos):
+        self.__dict__.update(campos)
+
+
+def bench_responder(conversaciones, segundos):
+    chat = _ChatEnMemoria()
+    Chat = SimpleNamespace(query=SimpleNamespace(get=lambda chat_id: chat))
+    db = SimpleNamespace(session=_Sesion())
+
+    total = 0
+    with mock.patch.object(chat_service, "Chat", Chat), \
+            mock.patch.object(chat_service, "Mensaje", _Mensaje), \
+            mock.patch.object(chat_service, "db", db):
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < segundos:
+            for mensajes in conversaciones:
+                chat.metadatos = {}
+                for texto in mensajes:
+                    chat_service.responder_mensaje(1, texto, 1)
+                total += len(mensajes)
+        return total, time.perf_counter() - inicio
+
+
+MODOS = {"transicion": bench_transicion, "responder": bench_responder}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Mensajes por segundo de la máquina de estados")
+    arg_parser.add_argument("--segundos", type=float, default=3.0, help="duración de cada modo")
+    arg_parser.add_argument("--modo", choices=tuple(MODOS), action="append")
+    args = arg_parser.parse_args()
+
+    conversaciones = _conversaciones()
+    turnos = sum(len(m) for m in conversaciones)
+    print(f"{len(conversaciones)} conversaciones, {turnos} turnos por vuelta.")
+    for modo in args.modo or MODOS:
+        MODOS[modo](conversaciones, min(0.5, args.segundos))  # calentamiento
+        mensajes, transcurrido = MODOS[modo](conversaciones, args.segundos)
+        print(
+            f"{modo:<11} {mensajes / transcurrido:>12,.0f} mensajes/s "
+            f"{transcurrido / mensajes * 1e6:>8.1f} µs/mensaje"
+        )
@@ -0,0 +1,140 @@
+# benchmarks/bench_fechas.py
+"""
+Latencia por llamada del reconocimiento de fechas, antes y después de la
+gramática precompilada de services.fechas.
+
+  - antes:   lo que hacían los procesadores originalmente: search_dates
+             (lugar_fecha), dateparser.parse (rango_fecha) y la traducción
+             de meses regex por regex + dateutil (plazo).
+  - despues: buscar_fecha, parsear_rango y parsear_fecha.
+
+Cada caso se mide por separado con el modelo ya cargado: la importación
+de dateparser (segundos la primera vez) se reporta aparte. Si dateparser
+o python-dateutil no están instalados, solo se mide "despues".
+
+Uso (desde backend/):
+    python benchmarks/bench_fechas.py --repeticiones 200
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.fechas import buscar_fecha, parsear_rango, parsear_fecha, DESDE_POR  # noqa: E402
+
+# (procesador, respuesta) típicas del chat
+CORPUS = [
+    ("lugar_fecha", "Lima, 30 de octubre de 2025"),
+    ("lugar_fecha", "En Sullana el 1ro de enero del 2026"),
+    ("lugar_fecha", "Arequipa 01/11/2025"),
+    ("lugar_fecha", "Piura, 15 oct. 2025"),
+    ("rango_fecha", "Desde el 1 de enero de 2026 hasta el 31 de diciembre de 2026"),
+    ("rango_fecha", "del 01/03/2026 al 28/02/2027"),
+    ("rango_fecha", "Desde el 15 de marzo hasta el 15 de setiembre de 2026"),
+    ("plazo", "Desde el 30 de Octubre de 2025 por 6 meses"),
+    ("plazo", "desde el 1 de febrero de 2026 por 2 años"),
+]
+
+_SETTINGS = {"DATE_ORDER": "DMY", "PREFER_DATES_FROM": "future"}
+
+_MESES_ES = {
+    "enero": "January", "febrero": "February", "marzo": "March", "abril": "April",
+    "mayo": "May", "junio": "June", "julio": "July", "agosto": "August",
+    "septiembre": "September", "setiembre": "September", "octubre": "October",
+    "noviembre": "November", "diciembre": "December"
+}
+
+
+# --- Antes: implementación original de los procesadores ---
+
+def _antes_lugar_fecha(texto):
+    from dateparser.search import search_dates
+    fechas = search_dates(texto, languages=["es"], settings=_SETTINGS)
+    return fechas[0] if fechas else None
+
+
+def _antes_rango_fecha(texto):
+    import dateparser
+    partes = re.split(r"\s+(hasta|al)\s+", texto, maxsplit=1, flags=re.IGNORECASE)
+    inicio = partes[0].replace("Desde el", "").strip()
+    fin = partes[2].strip() if len(partes) > 2 else None
+    f_inicio = dateparser.parse(inicio, languages=["es"], settings=_SETTINGS)
+    f_fin = dateparser.parse(fin, languages=["es"], settings=_SETTINGS) if f_inicio and fin else None
+    return f_inicio, f_fin
+
+
+def _antes_plazo(texto):
+    from dateutil import parser
+    m = re.search(r"(?i)desde\s+el\s+(.*?)\s+por\s+(\d+)\s*(mes(?:es)?|año(?:s)?)", texto)
+    fecha_texto = m.group(1).strip()
+    for esp, eng in _MESES_ES.items():
+        fecha_texto = re.sub(rf"\b{esp}\b", eng, fecha_texto, flags=re.IGNORECASE)
+    return parser.parse(fecha_texto, dayfirst=True)
+
+
+# --- Después: gramática precompilada ---
+
+def _despues_plazo(texto):
+    return parsear_fecha(DESDE_POR.search(texto).group("inicio"))
+
+
+IMPLEMENTACIONES = {
+    "antes": {"lugar_fecha": _antes_lugar_fecha, "rango_fecha": _antes_rango_fecha, "plazo": _antes_plazo},
+    "despues": {"lugar_fecha": buscar_fecha, "rango_fecha": parsear_rango, "plazo": _despues_plazo},
+}
+
+
+def _importar_antes():
+    """Segundos de la primera importación de dateparser/dateutil, o None si no están."""
+    inicio = time.perf_counter()
+    try:
+        import dateparser.search  # noqa: F401
+        from dateutil import parser  # noqa: F401
+    except ImportError as e:
+        print(f"⚠️ {e}: se omite 'antes'.")
+        return None
+    return time.perf_counter() - inicio
+
+
+def medir(funcion, texto, repeticiones):
+    # Calentamiento (cachés internas de dateparser) y verificación
+    if not funcion(texto):
+        print(f"⚠️ {funcion.__name__} no reconoce: {texto}")
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(texto)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), statistics.quantiles(tiempos, n=20)[18]
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Latencia de parseo de fechas antes/después")
+    arg_parser.add_argument("--repeticiones", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    versiones = ["despues"]
+    importacion = _importar_antes()
+    if importacion is not None:
+        print(f"Importación de dateparser + dateutil: {importacion:.2f}s (solo la primera vez)")
+        versiones.insert(0, "antes")
+
+    print(f"{'procesador':<12} {'respuesta':<62} " + " ".join(f"{v + ' p50/p95 (µs)':>24}" for v in versiones))
+    totales = {v: 0.0 for v in versiones}
+    for procesador, texto in CORPUS:
+        columnas = []
+        for version in versiones:
+            p50, p95 = medir(IMPLEMENTACIONES[version][procesador], texto, args.repeticiones)
+            totales[version] += p50
+            columnas.append(f"{p50 * 1e6:>11.1f} / {p95 * 1e6:>10.1f}")
+        print(f"{procesador:<12} {texto[:62]:<62} " + " ".join(columnas))
+
+    print()
+    for version in versiones:
+        print(f"{version:<8} media por llamada: {totales[version] / len(CORPUS) * 1e6:.1f} µs")
+    if "antes" in totales:
+        print(f"Aceleración: {totales['antes'] / totales['despues']:.0f}x")
@@ -0,0 +1,224 @@
+# benchmarks/bench_patrones.py
+"""
+Reglas de extracción de data_processors antes y después de services.patrones.
+
+  - antes:   procesar_arrendamiento y limpiar_direccion tal como estaban,
+             con re.search en línea (cada búsqueda del inmueble y del pago
+             evaluada dos veces) y la deduplicación O(n²) de palabras.
+  - despues: las funciones actuales de services.data_processors (patrones
+             precompilados, grupo() y un set de palabras vistas).
+
+Sobre un corpus de respuestas reales del chat mide el tiempo por llamada
+y verifica que ambas versiones devuelvan lo mismo. Las respuestas que
+hacían fallar a la versión anterior (palabra clave presente pero sin
+coincidencia, p. ej. "zona" sin "registral") se cuentan aparte.
+
+Uso (desde backend/):
+    python benchmarks/bench_patrones.py --repeticiones 2000
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.montos import numero_a_letras  # noqa: E402
+from services.data_processors import procesar_arrendamiento, limpiar_direccion  # noqa: E402
+
+CORPUS_ARRENDAMIENTO = [
+    {
+        "arrendador": "Manuel Ernesto Leigh Ramirez, DNI 76854553, con domicilio en Calle Leoncio Prado 162, Sullana",
+        "arrendatario": "Ana María Torres Quispe, DNI 45879632, con domicilio en Av. José de Lama 1020, Sullana",
+        "inmueble": "Calle Leoncio Prado 166, distrito Sullana, provincia Sullana, departamento Piura, "
+                    "partida 11023456, zona registral N° I Sede Piura",
+        "inmueble_destino": "Vivienda",
+        "plazo": "2 años, desde el 01/11/2025 hasta el 31/10/2027, preaviso de 30 días, penalidad de 2 meses",
+        "pago": "El quinto día de cada mes en la cuenta de ahorros BCP 475-12345678-0-12, resolución a los 2 meses",
+        "subarriendo": "no",
+        "jurisdiccion": "sullana",
+        "contrato": "Sullana, 30 de octubre de 2025",
+    },
+    {
+        "arrendador": "Inversiones del Norte SAC representada por Luis Gómez, DNI 40112233, domicilio en Jr. Lima 455",
+        "arrendatario": "Carla Ruiz",
+        "inmueble": "Av. Grau 1450 Dpto 302, distrito Piura, provincia Piura, departamento Piura",
+        "inmueble_destino": "Oficina",
+        "plazo": "1 año a partir del 15/01/2026 al 14/01/2027 con aviso de 60 dias y 3 meses de penalidad",
+        "pago": "Primer día hábil, cuenta corriente BBVA 0011-0234-0100012345",
+        "subarriendo": "sí",
+        "jurisdiccion": "piura",
+        "contrato": "Piura, 10 de enero de 2026",
+    },
+    {
+        "arrendador": "Rosa Elvira Campos, DNI 07654321, domicilio en Mz B lote 5 Urbanización Santa Rosa",
+        "arrendatario": "Pedro Salas, DNI 44556677, domicilio en Calle Las Begonias 450, San Isidro",
+        "inmueble": "Urbanización Santa Rosa Mz B lote 5, zona de playa",
+        "inmueble_destino": "Vivienda",
+        "plazo": "",
+        "pago": "Se paga por adelantado",
+        "subarriendo": "",
+        "jurisdiccion": "lima",
+        "contrato": "Lima",
+    },
+]
+
+CORPUS_DIRECCIONES = [
+    "Calle Leoncio Prado 166, en Sullana, Sullana, Piura",
+    "Av. José de Lama 1020 en Sullana Sullana Piura",
+    "Jr. Lima 455, Piura, Piura, Piura",
+    "Urbanización Santa Rosa Mz B lote 5, en Santa Rosa, Lima, Lima",
+    # Respuesta larga (descripciones pegadas por el usuario): aquí se nota el O(n²)
+    " ".join(f"Referencia{i} cerca del parque y la avenida principal" for i in range(60)) + ", Sullana, Piura",
+]
+
+
+# --- Antes: implementación original ---
+
+def antes_procesar_arrendamiento(datos: dict) -> dict:
+    arrendador_texto = datos.get("arrendador", "")
+    match_arr = re.search(r"(.+?),\s*DNI\s*(\d+).+domicilio\s*en\s*(.+)", arrendador_texto, re.I)
+    arrendador = {
+        "nombre": match_arr.group(1).strip() if match_arr else arrendador_texto,
+        "dni": match_arr.group(2) if match_arr else "",
+        "domicilio": match_arr.group(3).strip() if match_arr else "",
+        "tratamiento": "EL ARRENDADOR"
+    }
+
+    arrendatario_texto = datos.get("arrendatario", "")
+    match_ate = re.search(r"(.+?),\s*DNI\s*(\d+).+domicilio\s*en\s*(.+)", arrendatario_texto, re.I)
+    arrendatario = {
+        "nombre": match_ate.group(1).strip() if match_ate else arrendatario_texto,
+        "dni": match_ate.group(2) if match_ate else "",
+        "domicilio": match_ate.group(3).strip() if match_ate else "",
+        "tratamiento": "EL ARRENDATARIO"
+    }
+
+    inm_texto = datos.get("inmueble", "")
+    inmueble = {
+        "direccion": re.search(r"(Av\.|Jr\.|Calle|Mz|Urbanización|[A-Za-z\s]+)\s+[^\d]*\d*", inm_texto).group(0).strip() if re.search(r"(Av\.|Jr\.|Calle|Mz|Urbanización|[A-Za-z\s]+)\s+[^\d]*\d*", inm_texto) else inm_texto,
+        "distrito": re.search(r"distrito\s+([A-Za-záéíóúñ\s]+)", inm_texto, re.I).group(1).strip().title() if "distrito" in inm_texto.lower() else "",
+        "provincia": re.search(r"provincia\s+([A-Za-záéíóúñ\s]+)", inm_texto, re.I).group(1).strip().title() if "provincia" in inm_texto.lower() else "",
+        "departamento": re.search(r"departamento\s+([A-Za-záéíóúñ\s]+)", inm_texto, re.I).group(1).strip().title() if "departamento" in inm_texto.lower() else "",
+        "partida_electronica": re.search(r"partida\s*(\d+)", inm_texto, re.I).group(1) if "partida" in inm_texto.lower() else "",
+        "zona_registral": re.search(r"zona\s+registral\s+(.+)", inm_texto, re.I).group(1).strip().title() if "zona" in inm_texto.lower() else "",
+        "destino": datos.get("inmueble_destino", "").lower()
+    }
+
+    plazo_texto = datos.get("plazo", "")
+    match_plazo = re.search(
+        r"(\d+)\s*años?.*?(\d{1,2}/\d{1,2}/\d{4}).*?(\d{1,2}/\d{1,2}/\d{4}).*?(\d+)\s*d[ií]as.*?(\d+)\s*mes",
+        plazo_texto, re.I
+    )
+    plazo = {
+        "anios_letras": numero_a_letras(int(match_plazo.group(1))).upper() if match_plazo else "",
+        "anios_numeros": match_plazo.group(1) if match_plazo else "",
+        "fecha_inicio": match_plazo.group(2) if match_plazo else "",
+        "fecha_fin": match_plazo.group(3) if match_plazo else "",
+        "preaviso_dias_letras": numero_a_letras(int(match_plazo.group(4))).upper() if match_plazo else "",
+        "preaviso_dias_numeros": match_plazo.group(4) if match_plazo else "",
+        "penalidad_meses_letras": numero_a_letras(int(match_plazo.group(5))).upper() if match_plazo else ""
+    }
+
+    renta = datos.get("renta", {})
+
+    pago_texto = datos.get("pago", "")
+    pago = {
+        "dia_limite_texto": re.search(r"(primer|segundo|tercer|cuarto|quinto|sexto|s[eé]ptimo)", pago_texto, re.I).group(1).upper() if re.search(r"(primer|segundo|tercer|cuarto|quinto|sexto|s[eé]ptimo)", pago_texto, re.I) else "QUINTO",
+        "meses_incumplimiento_resolucion": re.search(r"(\d+)\s*mes", pago_texto, re.I).group(1) if "mes" in pago_texto.lower() else "2",
+        "cuenta": {
+            "tipo": re.search(r"(ahorros|corriente)", pago_texto, re.I).group(1).upper() if re.search(r"(ahorros|corriente)", pago_texto, re.I) else "CUENTA DE AHORROS",
+            "numero": re.search(r"(\d[\d-]+)", pago_texto).group(1) if re.search(r"(\d[\d-]+)", pago_texto) else "",
+            "banco": re.search(r"(BCP|BBVA|INTERBANK|SCOTIABANK|BANCO|FINANCIERA)\s*[A-Z]*", pago_texto, re.I).group(1).upper() if re.search(r"(BCP|BBVA|INTERBANK|SCOTIABANK|BANCO|FINANCIERA)", pago_texto, re.I) else ""
+        }
+    }
+
+    subarriendo_texto = datos.get("subarriendo", "").strip().lower()
+    subarriendo = {"permitido": subarriendo_texto in ["si", "sí", "yes", "permitido"]}
+
+    jurisdiccion = {"distrito_judicial": datos.get("jurisdiccion", "").title()}
+    contrato = {}
+
+    try:
+        ciudad, fecha = [x.strip() for x in datos.get("contrato", "").split(",")]
+        contrato = {"ciudad_firma": ciudad, "fecha_firma": fecha}
+    except:  # noqa: E722
+        contrato = {"ciudad_firma": "", "fecha_firma": ""}
+
+    return {
+        "arrendador": arrendador,
+        "arrendatario": arrendatario,
+        "inmueble": inmueble,
+        "plazo": plazo,
+        "renta": renta,
+        "pago": pago,
+        "subarriendo": subarriendo,
+        "jurisdiccion": jurisdiccion,
+        "contrato": contrato
+    }
+
+
+def antes_limpiar_direccion(texto_original: str) -> str:
+    if not texto_original:
+        return ""
+
+    texto = re.sub(r"\b[Ee]n\b", "", texto_original)
+    texto = texto.replace(",", " ")
+    texto = re.sub(r"\s+", " ", texto).strip()
+
+    partes = texto.split(" ")
+    partes_unicas = []
+    for palabra in partes:
+        if palabra.lower() not in [p.lower() for p in partes_unicas]:
+            partes_unicas.append(palabra)
+    texto = " ".join(partes_unicas)
+    partes = texto.split()
+    if len(partes) >= 4:
+        ultimas = partes[-3:]
+        if all(re.match(r"^[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+$", p) for p in ultimas):
+            texto = " ".join(partes[:-2])
+
+    return texto.strip()
+
+
+CASOS = [
+    ("procesar_arrendamiento", antes_procesar_arrendamiento, procesar_arrendamiento, CORPUS_ARRENDAMIENTO),
+    ("limpiar_direccion", antes_limpiar_direccion, limpiar_direccion, CORPUS_DIRECCIONES),
+]
+
+
+def medir(funcion, entrada, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(entrada)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Reglas de extracción antes/después")
+    arg_parser.add_argument("--repeticiones", type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    print(f"{'función':<24} {'entrada':>7} {'antes (µs)':>11} {'después (µs)':>13} {'x':>6}  resultado")
+    for nombre, antes, despues, corpus in CASOS:
+        total_antes = total_despues = 0.0
+        for i, entrada in enumerate(corpus):
+            t_despues = medir(despues, entrada, args.repeticiones)
+            try:
+                iguales = antes(entrada) == despues(entrada)
+            except AttributeError:
+                # La versión anterior fallaba con esta respuesta
+                print(f"{nombre:<24} {i:>7} {'falla':>11} {t_despues * 1e6:>13.1f} {'':>6}  antes: AttributeError")
+                continue
+            t_antes = medir(antes, entrada, args.repeticiones)
+            total_antes += t_antes
+            total_despues += t_despues
+            print(
+                f"{nombre:<24} {i:>7} {t_antes * 1e6:>11.1f} {t_despues * 1e6:>13.1f} "
+                f"{t_antes / t_despues:>5.1f}x  {'igual' if iguales else 'DISTINTO'}"
+            )
+        print(f"{nombre:<24} {'total':>7} {total_antes * 1e6:>11.1f} {total_despues * 1e6:>13.1f}")
@@ -0,0 +1,167 @@
+# benchmarks/carga_streaming.py
+"""
+Prueba de carga de POST /chat/streaming: cuántos streams concurrentes
+sostiene cada servidor.
+
+Abre N peticiones a la vez contra cada servidor y mide cuántas terminan,
+el máximo de streams abiertos simultáneamente, la latencia hasta el
+primer byte del cuerpo y la duración total. Se repite para cada nivel de
+concurrencia. Cliente HTTP/1.1 mínimo sobre asyncio, sin dependencias.
+
+Levantar los dos servidores con la misma BBDD y configuración:
+    flask --app app:create_app run --port 5000     # hilos (Flask/Werkzeug)
+    uvicorn asgi:app --port 8000                   # asyncio (asgi.py)
+
+y ejecutar:
+    python benchmarks/carga_streaming.py --api-key <API_KEY> \\
+        --objetivo hilos=http://127.0.0.1:5000 \\
+        --objetivo asgi=http://127.0.0.1:8000 \\
+        --concurrencia 50,200,1000
+
+Cada petición sin --chat-id crea un chat nuevo para el usuario de la
+API key (se recomienda una BBDD de pruebas). Con CHAT_STREAM_TEXTO_DELAY
+en 0.02 s, la respuesta inicial (~150 caracteres) mantiene el stream
+abierto unos 3 s, suficiente para que las peticiones se solapen. Para
+niveles altos, subir el límite de archivos abiertos (ulimit -n) en el
+cliente y en el servidor.
+"""
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from urllib.parse import urlsplit
+
+
+class Metricas:
+    def __init__(self):
+        self.abiertos = 0
+        self.max_abiertos = 0
+        self.ok = 0
+        self.errores = {}
+        self.primer_byte = []
+        self.duracion = []
+
+    def error(self, motivo):
+        self.errores[motivo] = self.errores.get(motivo, 0) + 1
+
+
+def _peticion_http(host, ruta, cuerpo, api_key, formato):
+    accept = "text/event-stream" if formato == "sse" else "text/plain"
+    return (
+        f"POST {ruta}?formato={formato} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"Authorization: Bearer {api_key}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Accept: {accept}\r\n"
+        f"Content-Length: {len(cuerpo)}\r\n"
+        f"Connection: close\r\n\r\n"
+    ).encode("ascii") + cuerpo
+
+
+async def _un_stream(url, cuerpo, args, metricas):
+    partes = urlsplit(url)
+    puerto = partes.port or 80
+    inicio = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(partes.hostname, puerto), args.timeout
+        )
+        writer.write(_peticion_http(partes.netloc, "/chat/streaming", cuerpo, args.api_key, args.formato))
+        await writer.drain()
+
+        estado = await asyncio.wait_for(reader.readline(), args.timeout)
+        codigo = estado.split(b" ")[1].decode() if estado.count(b" ") >= 1 else "sin respuesta"
+        # Encabezados
+        while (await asyncio.wait_for(reader.readline(), args.timeout)) not in (b"\r\n", b""):
+            pass
+        if codigo != "200":
+            metricas.error(f"HTTP {codigo}")
+            return
+
+        primero = await asyncio.wait_for(reader.read(1), args.timeout)
+        if not primero:
+            metricas.error("cuerpo vacío")
+            return
+        metricas.primer_byte.append(time.perf_counter() - inicio)
+        metricas.abiertos += 1
+        metricas.max_abiertos = max(metricas.max_abiertos, metricas.abiertos)
+        try:
+            while await asyncio.wait_for(reader.read(4096), args.timeout):
+                pass
+        finally:
+            metricas.abiertos -= 1
+        metricas.duracion.append(time.perf_counter() - inicio)
+        metricas.ok += 1
+    except asyncio.TimeoutError:
+        metricas.error("timeout")
+    except OSError as e:
+        metricas.error(type(e).__name__)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _percentil(valores, p):
+    if not valores:
+        return float("nan")
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+async def medir(url, concurrencia, args):
+    cuerpo = json.dumps({"mensaje": args.mensaje, "chat_id": args.chat_id}).encode("utf-8")
+    metricas = Metricas()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_un_stream(url, cuerpo, args, metricas) for _ in range(concurrencia)))
+    metricas.total = time.perf_counter() - inicio
+    return metricas
+
+
+def _imprimir(nombre, concurrencia, m):
+    errores = ", ".join(f"{k}: {v}" for k, v in sorted(m.errores.items())) or "-"
+    print(
+        f"{nombre:<10} {concurrencia:>6} {m.ok:>6} {m.max_abiertos:>9} "
+        f"{_percentil(m.primer_byte, 50):>9.3f} {_percentil(m.primer_byte, 95):>9.3f} "
+        f"{_percentil(m.duracion, 95):>9.3f} {m.total:>8.2f}  {errores}"
+    )
+
+
+async def main(args):
+    objetivos = [o.split("=", 1) if "=" in o else (o, o) for o in args.objetivo]
+    niveles = [int(n) for n in args.concurrencia.split(",")]
+    capacidad = {}
+
+    print(f"{'servidor':<10} {'conc.':>6} {'ok':>6} {'max_abier':>9} "
+          f"{'ttfb_p50':>9} {'ttfb_p95':>9} {'dur_p95':>9} {'total_s':>8}  errores")
+    for nombre, url in objetivos:
+        for concurrencia in niveles:
+            m = await medir(url, concurrencia, args)
+            _imprimir(nombre, concurrencia, m)
+            # Capacidad: mayor nivel sin errores y con primer byte dentro del límite
+            if not m.errores and _percentil(m.primer_byte, 95) <= args.ttfb_max:
+                capacidad[nombre] = concurrencia
+            await asyncio.sleep(args.pausa)
+
+    print()
+    for nombre, _ in objetivos:
+        print(f"Capacidad de {nombre}: {capacidad.get(nombre, 0)} streams concurrentes "
+              f"(sin errores, ttfb p95 <= {args.ttfb_max:.1f}s)")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Prueba de carga de /chat/streaming")
+    arg_parser.add_argument("--objetivo", action="append", required=True,
+                            help="nombre=url del servidor (repetible)")
+    arg_parser.add_argument("--api-key", required=True)
+    arg_parser.add_argument("--concurrencia", default="10,50,200,1000",
+                            help="niveles de concurrencia separados por comas")
+    arg_parser.add_argument("--formato", choices=("texto", "sse"), default="texto")
+    arg_parser.add_argument("--mensaje", default="hola")
+    arg_parser.add_argument("--chat-id", type=int, default=None)
+    arg_parser.add_argument("--timeout", type=float, default=30.0, help="segundos por lectura")
+    arg_parser.add_argument("--ttfb-max", type=float, default=2.0)
+    arg_parser.add_argument("--pausa", type=float, default=1.0, help="segundos entre niveles")
+    asyncio.run(main(arg_parser.parse_args()))
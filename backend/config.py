@@ -7,3 +7,22 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRETKEY = 'NOTARIA'
+
+    # Streaming del chat: "sse" (fragmentos sin bloquear el worker) o "texto" (compatibilidad)
+    CHAT_STREAM_FORMATO = os.getenv("CHAT_STREAM_FORMATO", "texto")
+    CHAT_STREAM_MODO = os.getenv("CHAT_STREAM_MODO", "palabra")  # caracter, palabra, oracion
+    CHAT_STREAM_PAUSA_MS = int(os.getenv("CHAT_STREAM_PAUSA_MS", "30"))
+    CHAT_STREAM_TEXTO_DELAY = float(os.getenv("CHAT_STREAM_TEXTO_DELAY", "0.02"))
+
+    # Servidor ASGI (asgi.py): hilos para la lógica de conversación y la BBDD
+    ASGI_EXECUTOR_WORKERS = int(os.getenv("ASGI_EXECUTOR_WORKERS", "16"))
+
+    # Cargar el modelo spaCy al crear la app en lugar de en el primer uso
+    NLP_WARMUP = os.getenv("NLP_WARMUP", "false").lower() in ("1", "true", "si", "sí")
+
+    # Vista previa del contrato: enviar el HTML por fragmentos mientras se renderiza
+    # (opcional; también con ?stream=1 en la petición)
+    DOCUMENTO_STREAMING = os.getenv("DOCUMENTO_STREAMING", "false").lower() in ("1", "true", "si", "sí")
+
+    # Compilar todas las plantillas de contratos al crear la app
+    JINJA_WARMUP = os.getenv("JINJA_WARMUP", "true").lower() in ("1", "true", "si", "sí")
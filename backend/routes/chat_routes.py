@@ -1,14 +1,16 @@
-from flask import Blueprint, request, jsonify, Response, stream_with_context
+import os
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app, send_file
 from sqlalchemy import desc
-from database import db
-from datetime import datetime
 
 # Models
 from models import Usuario, Chat, Mensaje, Contrato
 
 # Services
-from services.chat_service import procesar_mensaje   # ← ahora este es streaming
-from services.generation_service import generar_documento_final, formalizar_contrato
+from services.chat_service import procesar_mensaje, responder_mensaje, stream_sse, obtener_o_crear_chat
+from services.generation_service import generar_vista_previa, formalizar_contrato
+from services.pdf_service import estado_pdf
+from services.document_store import ruta_objeto, objeto_de_usuario
+from services.data_processors import PROCESSOR_REGISTRY
 
 chat_bp = Blueprint("chat_bp", __name__)
 
@@ -92,23 +94,42 @@ def handle_chat_streaming():
         return jsonify({"error": "Mensaje no proporcionado"}), 400
 
     # Si no existe chat, crear uno
-    if not chat_id:
-        nuevo_chat = Chat(
-            usuario_id=usuario.id,
-            nombre=data.get("nombre", f"Contrato - {datetime.now().strftime('%Y-%m-%d')}"),
-            metadatos={}
+    chat_id = obtener_o_crear_chat(usuario.id, chat_id, data.get("nombre"))
+
+    formato = _formato_streaming()
+
+    if formato == "sse":
+        # La respuesta se calcula dentro del request y se envía por fragmentos;
+        # el cliente aplica la pausa, así el worker no duerme entre fragmentos.
+        respuesta = responder_mensaje(chat_id, mensaje, usuario.id)
+        sse = stream_sse(
+            respuesta,
+            modo=request.args.get("modo", current_app.config["CHAT_STREAM_MODO"]),
+            pausa_ms=current_app.config["CHAT_STREAM_PAUSA_MS"],
         )
-        db.session.add(nuevo_chat)
-        db.session.commit()
-        chat_id = nuevo_chat.id
+        return Response(sse, mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+
+    delay = current_app.config["CHAT_STREAM_TEXTO_DELAY"]
 
     def generate():
-        # Streaming real: cada chunk (caracter) se envía al cliente
-        for chunk in procesar_mensaje(chat_id, mensaje, usuario.id):
+        # Compatibilidad: cada chunk (caracter) se envía al cliente
+        for chunk in procesar_mensaje(chat_id, mensaje, usuario.id, delay=delay):
             yield chunk
 
     return Response(stream_with_context(generate()), mimetype="text/plain")
 
+def _formato_streaming():
+    """Elige 'sse' o 'texto' según ?formato=, la cabecera Accept o la configuración."""
+    formato = request.args.get("formato")
+    if formato in ("sse", "texto"):
+        return formato
+    if "text/event-stream" in request.headers.get("Accept", ""):
+        return "sse"
+    return current_app.config["CHAT_STREAM_FORMATO"]
+
 # ---------------------------------------------------------------------
 # DOCUMENTO HTML PREVIEW 
 # ---------------------------------------------------------------------
@@ -118,11 +139,29 @@ def get_documento_preview_html():
     if not chat_id:
         return jsonify({"error": "ID de chat no proporcionado"}), 400
     try:
-        html_preview = generar_documento_final(chat_id)
-        return Response(html_preview, mimetype='text/html')
+        # Si el cliente ya tiene esta versión (If-None-Match), 304 sin renderizar
+        html_preview, etag = generar_vista_previa(
+            chat_id, request.if_none_match, streaming=_documento_en_streaming()
+        )
+        if html_preview is None:
+            response = Response(status=304)
+        elif isinstance(html_preview, str):
+            response = Response(html_preview, mimetype='text/html')
+        else:
+            response = Response(stream_with_context(html_preview), mimetype='text/html')
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _documento_en_streaming():
+    """?stream=0/1 tiene prioridad sobre DOCUMENTO_STREAMING de la config."""
+    stream = request.args.get("stream")
+    if stream is not None:
+        return stream.lower() in ("1", "true", "si", "sí")
+    return current_app.config.get("DOCUMENTO_STREAMING", False)
+
 # ---------------------------------------------------------------------
 # FORMALIZAR DOCUMENTO FINAL
 # ---------------------------------------------------------------------
@@ -133,6 +172,57 @@ def formalize_documento():
         return jsonify({"error": "Chat ID no proporcionado"}), 400
     try:
         codigo = formalizar_contrato(chat_id)
-        return jsonify({"codigo_contrato": codigo}), 200
+        # El PDF se genera en segundo plano: consultar /documento/pdf?codigo=...
+        # (si no se pudo encolar, el contrato ya quedó marcado con el error)
+        contrato = Contrato.query.filter_by(codigo=codigo).first()
+        return jsonify({"codigo_contrato": codigo, "pdf": estado_pdf(contrato)}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@chat_bp.route("/documento/pdf", methods=["GET"])
+def get_estado_pdf():
+    usuario = get_user_from_api_key()
+    if not usuario:
+        return jsonify({"error": "No autorizado"}), 401
+
+    codigo = request.args.get("codigo")
+    if not codigo:
+        return jsonify({"error": "Código de contrato no proporcionado"}), 400
+    contrato = Contrato.query.filter_by(codigo=codigo, creador_id=usuario.id).first()
+    if not contrato:
+        return jsonify({"error": "Contrato no encontrado"}), 404
+    return jsonify(estado_pdf(contrato)), 200
+
+@chat_bp.route("/documento/objeto/<nombre>", methods=["GET"])
+def get_objeto_documento(nombre):
+    usuario = get_user_from_api_key()
+    if not usuario:
+        return jsonify({"error": "No autorizado"}), 401
+
+    # Solo los artefactos de contratos del propio usuario
+    ruta = ruta_objeto(nombre)
+    if not ruta or not os.path.exists(ruta) or not objeto_de_usuario(nombre, usuario.id):
+        return jsonify({"error": "Documento no encontrado"}), 404
+    # Contenido inmutable (el nombre es su SHA-256), pero privado
+    response = send_file(ruta, etag=nombre.split(".")[0], max_age=31536000)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+# ---------------------------------------------------------------------
+# ESTADÍSTICAS (ADMINISTRADOR)
+# ---------------------------------------------------------------------
+@chat_bp.route("/admin/procesadores/estadisticas", methods=["GET"])
+def get_estadisticas_procesadores():
+    """Aciertos, fallos y desalojos de la caché de procesadores de este worker."""
+    usuario = get_user_from_api_key()
+    if not usuario:
+        return jsonify({"error": "No autorizado"}), 401
+    if not usuario.rol or usuario.rol.nombre != "administrador":
+        return jsonify({"error": "Acceso restringido a administradores"}), 403
+
+    estadisticas = PROCESSOR_REGISTRY.estadisticas()
+    consultas = estadisticas["hits"] + estadisticas["misses"]
+    estadisticas["tasa_aciertos"] = round(estadisticas["hits"] / consultas, 4) if consultas else None
+    estadisticas["pid"] = os.getpid()
+    return jsonify(estadisticas), 200
@@ -1,23 +1,101 @@
+import re
 import time
+import asyncio
 import json
 from models import Chat, Mensaje, Usuario
 from database import db
 from datetime import datetime
 from data.contracts_data import CONTRACTS, DEF_AFFIRMATIVES, DEF_NEGATIVES
 from services.generation_service import formalizar_contrato
-from services.data_processors import PROCESSOR_REGISTRY
-from services.nlp_utils import get_nlp
+from services.nlp_utils import lematizar_lote
+from services.contract_detector import DetectorTipoContrato
 
-nlp = get_nlp()
+# Índice de sinónimos de CONTRACTS, construido una sola vez
+DETECTOR_CONTRATOS = DetectorTipoContrato(CONTRACTS)
+
+# Patrones para fragmentar la respuesta en modo streaming
+_FRAGMENTO_PATTERNS = {
+    "palabra": re.compile(r"\S+\s*|\s+"),
+    "oracion": re.compile(r"[^.!?\n]*(?:[.!?]+|\n+|$)\s*"),
+}
 
 def stream_response(texto_base: str, delay: float = 0.02):
+    """
+    Modo de compatibilidad (text/plain): envía la respuesta caracter por caracter.
+    Con delay=0 no bloquea el hilo del worker.
+    """
     if not texto_base:
         return
     for char in texto_base:
         yield char
-        time.sleep(delay)
+        if delay:
+            time.sleep(delay)
+
+def fragmentar_respuesta(texto: str, modo: str = "palabra"):
+    """
+    Divide el texto en fragmentos del tamaño de una palabra o una oración.
+    Los fragmentos concatenados reproducen el texto original.
+    """
+    if not texto:
+        return []
+    if modo == "caracter":
+        return list(texto)
+    pattern = _FRAGMENTO_PATTERNS.get(modo, _FRAGMENTO_PATTERNS["palabra"])
+    return [f for f in pattern.findall(texto) if f]
+
+def stream_sse(texto_base: str, modo: str = "palabra", pausa_ms: int = 30):
+    """
+    Envía la respuesta como Server-Sent Events, un evento por fragmento.
+    El ritmo de escritura lo aplica el cliente con 'pausa_ms'; el servidor
+    nunca duerme, así que el hilo queda libre en cuanto se vacía el buffer.
+    """
+    fragmentos = fragmentar_respuesta(texto_base, modo)
+    yield f"event: inicio\ndata: {json.dumps({'modo': modo, 'pausa_ms': pausa_ms, 'total': len(fragmentos)})}\n\n"
+    for fragmento in fragmentos:
+        yield f"data: {json.dumps({'text': fragmento}, ensure_ascii=False)}\n\n"
+    yield "event: fin\ndata: {}\n\n"
+
+async def astream_response(texto_base: str, delay: float = 0.02):
+    """
+    Versión asíncrona de stream_response: la pausa es cooperativa
+    (asyncio.sleep), de modo que no retiene ningún hilo.
+    """
+    for char in texto_base or "":
+        yield char
+        if delay:
+            await asyncio.sleep(delay)
+
+async def astream_sse(texto_base: str, modo: str = "palabra", pausa_ms: int = 30):
+    """Versión asíncrona de stream_sse para el servidor ASGI."""
+    for evento in stream_sse(texto_base, modo, pausa_ms):
+        yield evento
 
-def procesar_mensaje(chat_id, texto_usuario, usuario_id):
+def obtener_o_crear_chat(usuario_id, chat_id=None, nombre=None):
+    """Devuelve el chat_id recibido o crea un chat nuevo para el usuario."""
+    if chat_id:
+        return chat_id
+    nuevo_chat = Chat(
+        usuario_id=usuario_id,
+        nombre=nombre or f"Contrato - {datetime.now().strftime('%Y-%m-%d')}",
+        metadatos={}
+    )
+    db.session.add(nuevo_chat)
+    db.session.commit()
+    return nuevo_chat.id
+
+def procesar_mensaje(chat_id, texto_usuario, usuario_id, delay: float = 0.02):
+    """
+    Generador de compatibilidad (text/plain): procesa el mensaje y
+    transmite la respuesta caracter por caracter.
+    """
+    respuesta = responder_mensaje(chat_id, texto_usuario, usuario_id)
+    yield from stream_response(respuesta, delay)
+
+def responder_mensaje(chat_id, texto_usuario, usuario_id) -> str:
+    """
+    Avanza la conversación con el mensaje del usuario, guarda ambos
+    mensajes en la BBDD y devuelve el texto completo de la respuesta.
+    """
     chat = Chat.query.get(chat_id)
     if not chat:
         raise ValueError("Chat no encontrado")
@@ -25,140 +103,8 @@ def procesar_mensaje(chat_id, texto_usuario, usuario_id):
     # SOLUCIÓN CLAVE: Usar .copy() para que SQLAlchemy detecte el cambio en el JSON.
     contexto = (chat.metadatos or {}).copy()
 
-    # --- ANÁLISIS DE MENSAJE ESPECIAL (con firmantes) ---
-    is_signers_confirmation = texto_usuario.startswith("Okay, procede a generar el contrato con estos firmantes:")
-    
-    if is_signers_confirmation:
-        try:
-            json_str = texto_usuario.split("Okay, procede a generar el contrato con estos firmantes:")[1].strip()
-            firmantes = json.loads(json_str)
-            
-            codigo_contrato = formalizar_contrato(chat_id, firmantes_extra=firmantes)
-            contexto["estado"] = "formalizado"
-            contexto["codigo_contrato"] = codigo_contrato
-
-            respuesta = (
-                f"¡Perfecto! ✅ Se ha formalizado tu contrato con todos los firmantes.\n\n"
-                f"**Código de Contrato:** {codigo_contrato}"
-            )
-        except Exception as e:
-            print(f"Error en formalización con firmantes: {e}")
-            respuesta = "⚠️ Hubo un error al procesar los firmantes y formalizar el contrato. Por favor, intenta de nuevo."
-    
-    # --- FLUJO DE CONVERSACIÓN NORMAL ---
-    elif "tipo_contrato" not in contexto:
-        tipo = detectar_tipo_contrato(texto_usuario)
-        if tipo:
-            contexto["tipo_contrato"] = tipo
-            contexto["estado"] = "solicitando_datos"
-            contexto["pregunta_actual"] = 0
-            contexto["respuestas"] = {}
-
-            primera_pregunta = CONTRACTS[tipo]["preguntas"][0]["texto"]
-            respuesta = (
-                f"He detectado que deseas elaborar un **{CONTRACTS[tipo]['nombre']}**. "
-                f"¿Podrías responderme la siguiente pregunta?\n\n{primera_pregunta}"
-            )
-        else:
-            respuesta = (
-                "¿Podrías especificar qué tipo de contrato deseas elaborar? "
-                "Por ejemplo: arrendamiento, compraventa o prestación de servicios."
-            )
-
-    elif contexto.get("estado") == "solicitando_datos":
-        tipo = contexto["tipo_contrato"]
-        i = contexto.get("pregunta_actual", 0)
-        respuestas = contexto.get("respuestas", {})
-
-        pregunta_actual = CONTRACTS[tipo]["preguntas"][i]
-        clave_semantica = pregunta_actual["key"]
-        respuestas[clave_semantica] = texto_usuario
-        contexto["respuestas"] = respuestas
-
-        if i + 1 < len(CONTRACTS[tipo]["preguntas"]):
-            contexto["pregunta_actual"] = i + 1
-            siguiente = CONTRACTS[tipo]["preguntas"][i + 1]["texto"]
-            respuesta = siguiente
-        else:
-            contexto["estado"] = "revision"
-            respuesta = (
-                f"Perfecto. Ya tengo toda la información necesaria para elaborar el "
-                f"contrato de **{CONTRACTS[tipo]['nombre']}**.\n\n"
-                "¿Deseas que te muestre un resumen antes de generar el documento?"
-            )
-
-    elif contexto.get("estado") == "revision" and es_afirmativo(texto_usuario):
-        tipo = contexto["tipo_contrato"]
-        respuestas = contexto.get("respuestas", {})
-
-        resumen = (
-            f"Has solicitado un contrato de **{CONTRACTS[tipo]['nombre']}** "
-            "con los siguientes detalles:\n"
-        )
-        for idx, pregunta in enumerate(CONTRACTS[tipo]["preguntas"]):
-            key = pregunta["key"]
-            respuesta_usuario = respuestas.get(key, "No proporcionada")
-            resumen += f"- **{idx + 1}. {pregunta['texto']}**: {respuesta_usuario}\n"
-
-        resumen += (
-            "\n¿Confirmas que toda la información es correcta para generar el contrato preliminar?\n"
-            "Responde 'sí' para confirmar o 'no' para corregir."
-        )
-
-        respuesta = resumen
-        contexto["estado"] = "preliminar_confirmacion"
-
-    elif contexto.get("estado") == "preliminar_confirmacion":
-        if es_afirmativo(texto_usuario):
-            contexto["estado"] = "clausulas_especiales"
-            respuesta = (
-                "Perfecto 👍. Antes de generar el contrato preliminar, "
-                "¿deseas agregar alguna cláusula especial o condición adicional? "
-                "Por ejemplo: penalidades, ampliaciones o condiciones de pago."
-            )
-        elif es_negativo(texto_usuario):
-            respuesta = "Entendido. ¿Qué información te gustaría corregir o agregar?"
-        else:
-            respuesta = (
-                "Por favor, responde 'sí' para confirmar o 'no' si deseas modificar algún dato."
-            )
-
-    elif contexto.get("estado") == "clausulas_especiales":
-        if es_negativo(texto_usuario):
-            contexto["estado"] = "generando_contrato"
-            contexto["clausulas_especiales"] = []
-            respuesta = "Perfecto. Procederé a generar el contrato preliminar sin cláusulas adicionales."
-        elif es_afirmativo(texto_usuario):
-            contexto["estado"] = "registrando_clausulas"
-            respuesta = (
-                "Muy bien. Escribe las cláusulas o condiciones que quieras incluir.\n"
-                "Por ejemplo: 'El inquilino no podrá subarrendar el inmueble sin autorización escrita del arrendador.'"
-            )
-        else:
-            contexto.setdefault("clausulas_especiales", [])
-            contexto["clausulas_especiales"].append(texto_usuario)
-            respuesta = "Cláusula registrada ✅. ¿Deseas agregar otra más o continuamos con el contrato?"
-
-    elif contexto.get("estado") == "registrando_clausulas":
-        if es_negativo(texto_usuario):
-            contexto["estado"] = "generando_contrato"
-            respuesta = "Entendido. Procederé a generar el contrato con las cláusulas registradas."
-        else:
-            contexto.setdefault("clausulas_especiales", [])
-            contexto["clausulas_especiales"].append(texto_usuario)
-            respuesta = "Cláusula agregada ✅. ¿Deseas incluir otra más?"
-
-    elif contexto.get("estado") == "esperando_aprobacion_formal":
-        respuesta = "Por favor, responde 'sí' para abrir el formulario de firmantes o 'no' para revisar los datos."
-
-    elif contexto.get("estado") == "formalizado":
-        respuesta = (
-            f"Este chat ya generó el contrato {contexto.get('codigo_contrato')}.\n"
-            "¿Deseas crear un nuevo contrato?"
-        )
-
-    else:
-        respuesta = "No entendí tu solicitud. ¿Podrías ser más específico?"
+    # --- Despacho O(1) por estado (ver ESTADO_HANDLERS) ---
+    respuesta = ejecutar_transicion(contexto, texto_usuario, chat_id)
 
     msg_usuario = Mensaje(
         chat_id=chat_id,
@@ -180,29 +126,208 @@ def procesar_mensaje(chat_id, texto_usuario, usuario_id):
     chat.metadatos = contexto
     db.session.commit()
 
-    yield from stream_response(respuesta)
+    return respuesta
 
 def texto_normalizado(texto: str) -> str:
     if not texto:
         return ""
-    doc = nlp(texto.strip().lower())
-    return " ".join([token.lemma_ for token in doc])
+    return textos_normalizados([texto])[0]
+
+def textos_normalizados(textos) -> list:
+    """Normaliza (minúsculas + lemas) varios textos en un solo lote."""
+    limpios = [(t or "").strip().lower() for t in textos]
+    lemas = lematizar_lote(limpios)
+    return lemas if lemas is not None else limpios
 
 def es_afirmativo(texto: str) -> bool:
     txt_norm = texto.lower().strip().replace('.', '')
-    return any(af in txt_norm.split() for af in DEF_AFFIRMATIVES)
+    return not DEF_AFFIRMATIVES.isdisjoint(txt_norm.split())
 
 def es_negativo(texto: str) -> bool:
     txt_norm = texto.lower().strip().replace('.', '')
-    return any(neg in txt_norm.split() for neg in DEF_NEGATIVES)
+    return not DEF_NEGATIVES.isdisjoint(txt_norm.split())
 
 def detectar_tipo_contrato(texto: str) -> str | None:
-    if not texto:
-        return None
-    texto_lower = texto.lower()
-    for tipo, info in CONTRACTS.items():
-        terminos_de_busqueda = [tipo.replace('_', ' ')] + info.get("sinonimos", [])
-        for termino in terminos_de_busqueda:
-            if termino.lower() in texto_lower:
-                return tipo
-    return None
+    return DETECTOR_CONTRATOS.detectar(texto)
+
+# ---------------------------------------------------------------------
+# MÁQUINA DE ESTADOS DE LA CONVERSACIÓN
+# ---------------------------------------------------------------------
+PREFIJO_FIRMANTES = "Okay, procede a generar el contrato con estos firmantes:"
+
+# Estado sintético para chats que aún no tienen tipo de contrato
+ESTADO_INICIAL = "inicio"
+
+def _compilar_contratos(contracts):
+    """
+    Precompila, una sola vez al importar el módulo, lo que cada turno
+    necesita de CONTRACTS: claves y textos de preguntas, nombre del
+    contrato y las líneas fijas del resumen.
+    """
+    compilados = {}
+    for tipo, info in contracts.items():
+        preguntas = tuple((p["key"], p["texto"]) for p in info["preguntas"])
+        compilados[tipo] = {
+            "nombre": info["nombre"],
+            "claves": tuple(k for k, _ in preguntas),
+            "textos": tuple(t for _, t in preguntas),
+            "total": len(preguntas),
+            "resumen_prefijos": tuple(
+                f"- **{idx + 1}. {texto}**: " for idx, (_, texto) in enumerate(preguntas)
+            ),
+        }
+    return compilados
+
+CONTRATOS_COMPILADOS = _compilar_contratos(CONTRACTS)
+
+# estado -> función(contexto, texto_usuario) -> respuesta
+ESTADO_HANDLERS = {}
+
+def estado_handler(estado):
+    """Registra la función que atiende los mensajes recibidos en 'estado'."""
+    def decorador(func):
+        ESTADO_HANDLERS[estado] = func
+        return func
+    return decorador
+
+def ejecutar_transicion(contexto, texto_usuario, chat_id=None):
+    """
+    Aplica el mensaje del usuario sobre el contexto (mutándolo) y devuelve
+    la respuesta. El mensaje de confirmación de firmantes tiene prioridad
+    sobre cualquier estado.
+    """
+    if texto_usuario.startswith(PREFIJO_FIRMANTES):
+        return _confirmar_firmantes(chat_id, contexto, texto_usuario)
+
+    estado = contexto.get("estado") if "tipo_contrato" in contexto else ESTADO_INICIAL
+    handler = ESTADO_HANDLERS.get(estado, _estado_desconocido)
+    return handler(contexto, texto_usuario)
+
+def _confirmar_firmantes(chat_id, contexto, texto_usuario):
+    try:
+        json_str = texto_usuario[len(PREFIJO_FIRMANTES):].strip()
+        firmantes = json.loads(json_str)
+
+        codigo_contrato = formalizar_contrato(chat_id, firmantes_extra=firmantes)
+        contexto["estado"] = "formalizado"
+        contexto["codigo_contrato"] = codigo_contrato
+
+        return (
+            f"¡Perfecto! ✅ Se ha formalizado tu contrato con todos los firmantes.\n\n"
+            f"**Código de Contrato:** {codigo_contrato}"
+        )
+    except Exception as e:
+        print(f"Error en formalización con firmantes: {e}")
+        return "⚠️ Hubo un error al procesar los firmantes y formalizar el contrato. Por favor, intenta de nuevo."
+
+def _estado_desconocido(contexto, texto_usuario):
+    return "No entendí tu solicitud. ¿Podrías ser más específico?"
+
+@estado_handler(ESTADO_INICIAL)
+def _estado_inicio(contexto, texto_usuario):
+    tipo = detectar_tipo_contrato(texto_usuario)
+    if not tipo:
+        return (
+            "¿Podrías especificar qué tipo de contrato deseas elaborar? "
+            "Por ejemplo: arrendamiento, compraventa o prestación de servicios."
+        )
+
+    contexto["tipo_contrato"] = tipo
+    contexto["estado"] = "solicitando_datos"
+    contexto["pregunta_actual"] = 0
+    contexto["respuestas"] = {}
+
+    contrato = CONTRATOS_COMPILADOS[tipo]
+    return (
+        f"He detectado que deseas elaborar un **{contrato['nombre']}**. "
+        f"¿Podrías responderme la siguiente pregunta?\n\n{contrato['textos'][0]}"
+    )
+
+@estado_handler("solicitando_datos")
+def _estado_solicitando_datos(contexto, texto_usuario):
+    contrato = CONTRATOS_COMPILADOS[contexto["tipo_contrato"]]
+    i = contexto.get("pregunta_actual", 0)
+
+    respuestas = contexto.get("respuestas", {})
+    respuestas[contrato["claves"][i]] = texto_usuario
+    contexto["respuestas"] = respuestas
+
+    if i + 1 < contrato["total"]:
+        contexto["pregunta_actual"] = i + 1
+        return contrato["textos"][i + 1]
+
+    contexto["estado"] = "revision"
+    return (
+        f"Perfecto. Ya tengo toda la información necesaria para elaborar el "
+        f"contrato de **{contrato['nombre']}**.\n\n"
+        "¿Deseas que te muestre un resumen antes de generar el documento?"
+    )
+
+@estado_handler("revision")
+def _estado_revision(contexto, texto_usuario):
+    if not es_afirmativo(texto_usuario):
+        return _estado_desconocido(contexto, texto_usuario)
+
+    contrato = CONTRATOS_COMPILADOS[contexto["tipo_contrato"]]
+    respuestas = contexto.get("respuestas", {})
+
+    lineas = [
+        f"Has solicitado un contrato de **{contrato['nombre']}** "
+        "con los siguientes detalles:\n"
+    ]
+    for prefijo, key in zip(contrato["resumen_prefijos"], contrato["claves"]):
+        lineas.append(f"{prefijo}{respuestas.get(key, 'No proporcionada')}\n")
+    lineas.append(
+        "\n¿Confirmas que toda la información es correcta para generar el contrato preliminar?\n"
+        "Responde 'sí' para confirmar o 'no' para corregir."
+    )
+
+    contexto["estado"] = "preliminar_confirmacion"
+    return "".join(lineas)
+
+@estado_handler("preliminar_confirmacion")
+def _estado_preliminar_confirmacion(contexto, texto_usuario):
+    if es_afirmativo(texto_usuario):
+        contexto["estado"] = "clausulas_especiales"
+        return (
+            "Perfecto 👍. Antes de generar el contrato preliminar, "
+            "¿deseas agregar alguna cláusula especial o condición adicional? "
+            "Por ejemplo: penalidades, ampliaciones o condiciones de pago."
+        )
+    if es_negativo(texto_usuario):
+        return "Entendido. ¿Qué información te gustaría corregir o agregar?"
+    return "Por favor, responde 'sí' para confirmar o 'no' si deseas modificar algún dato."
+
+@estado_handler("clausulas_especiales")
+def _estado_clausulas_especiales(contexto, texto_usuario):
+    if es_negativo(texto_usuario):
+        contexto["estado"] = "generando_contrato"
+        contexto["clausulas_especiales"] = []
+        return "Perfecto. Procederé a generar el contrato preliminar sin cláusulas adicionales."
+    if es_afirmativo(texto_usuario):
+        contexto["estado"] = "registrando_clausulas"
+        return (
+            "Muy bien. Escribe las cláusulas o condiciones que quieras incluir.\n"
+            "Por ejemplo: 'El inquilino no podrá subarrendar el inmueble sin autorización escrita del arrendador.'"
+        )
+    contexto.setdefault("clausulas_especiales", []).append(texto_usuario)
+    return "Cláusula registrada ✅. ¿Deseas agregar otra más o continuamos con el contrato?"
+
+@estado_handler("registrando_clausulas")
+def _estado_registrando_clausulas(contexto, texto_usuario):
+    if es_negativo(texto_usuario):
+        contexto["estado"] = "generando_contrato"
+        return "Entendido. Procederé a generar el contrato con las cláusulas registradas."
+    contexto.setdefault("clausulas_especiales", []).append(texto_usuario)
+    return "Cláusula agregada ✅. ¿Deseas incluir otra más?"
+
+@estado_handler("esperando_aprobacion_formal")
+def _estado_esperando_aprobacion_formal(contexto, texto_usuario):
+    return "Por favor, responde 'sí' para abrir el formulario de firmantes o 'no' para revisar los datos."
+
+@estado_handler("formalizado")
+def _estado_formalizado(contexto, texto_usuario):
+    return (
+        f"Este chat ya generó el contrato {contexto.get('codigo_contrato')}.\n"
+        "¿Deseas crear un nuevo contrato?"
+    )
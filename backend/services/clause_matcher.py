@@ -0,0 +1,129 @@
+# services/clause_matcher.py
+"""
+Índices para mapear las cláusulas del usuario a CLAUSULAS_MAPEADAS.
+
+Los lemas de las palabras clave se calculan una sola vez y se guardan en
+un índice invertido (lema -> cláusulas), de modo que mapear una cláusula
+solo requiere buscar cada lema del texto en un diccionario.
+
+Opcionalmente (CLAUSULAS_MAPEO_SEMANTICO) y si el modelo trae vectores
+de palabras, se precalcula una matriz de embeddings del catálogo y todas
+las cláusulas del usuario se comparan contra todo el catálogo con una
+sola multiplicación de matrices.
+"""
+import os
+import threading
+import numpy as np
+from data.contracts_data import CLAUSULAS_MAPEADAS
+from services.nlp_utils import procesar_lote, tiene_vectores
+
+
+class IndiceLemasClausulas:
+    """Índice invertido lema -> ids de cláusula, en el orden del catálogo."""
+
+    def __init__(self, catalogo: dict, docs_keywords):
+        self.catalogo = catalogo
+        self._orden = {clave: i for i, clave in enumerate(catalogo)}
+        self._indice = {}
+
+        pares = [(clave, k) for clave, data in catalogo.items() for k in data["keywords"]]
+        for (clave, _), doc in zip(pares, docs_keywords):
+            if len(doc):
+                self._indice.setdefault(doc[0].lemma_, set()).add(clave)
+
+    def buscar(self, lemas) -> str | None:
+        """
+        Devuelve la primera cláusula del catálogo que comparte algún lema
+        con el texto, igual que recorrer el catálogo en orden.
+        """
+        candidatas = set()
+        for lema in lemas:
+            ids = self._indice.get(lema)
+            if ids:
+                candidatas.update(ids)
+        if not candidatas:
+            return None
+        return min(candidatas, key=self._orden.__getitem__)
+
+
+# Similitud coseno mínima para aceptar un mapeo semántico. El umbral no
+# está calibrado: los promedios de vectores de textos cortos se parecen
+# mucho entre sí, y un falso positivo sustituye la cláusula del usuario por
+# el texto legal de otra. Por eso el mapeo semántico está desactivado por
+# defecto; activarlo solo tras validar el umbral con cláusulas reales.
+UMBRAL_SIMILITUD = float(os.getenv("CLAUSULAS_UMBRAL_SIMILITUD", "0.75"))
+MAPEO_SEMANTICO = os.getenv("CLAUSULAS_MAPEO_SEMANTICO", "false").lower() in ("1", "true", "si", "sí")
+
+def _normalizar_filas(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.where(normas == 0, 1, normas)
+
+
+class MatrizSemanticaClausulas:
+    """
+    Embeddings normalizados del catálogo (una fila por cláusula), calculados
+    con los vectores del modelo a partir del título y las palabras clave.
+    """
+
+    def __init__(self, catalogo: dict, docs_catalogo, umbral: float = UMBRAL_SIMILITUD):
+        self.ids = list(catalogo)
+        self.umbral = umbral
+        vectores = [doc.vector for doc in docs_catalogo]
+        self.matriz = _normalizar_filas(np.asarray(vectores, dtype=np.float32))
+
+    def mapear(self, docs) -> list:
+        """
+        Devuelve, para cada doc, (id de cláusula, similitud) de la más
+        parecida, o (None, similitud) si no alcanza el umbral.
+        """
+        if not docs:
+            return []
+        consultas = _normalizar_filas(np.asarray([doc.vector for doc in docs], dtype=np.float32))
+        similitudes = consultas @ self.matriz.T
+        mejores = similitudes.argmax(axis=1)
+        puntajes = similitudes[np.arange(len(docs)), mejores]
+        return [
+            (self.ids[j] if puntaje >= self.umbral else None, float(puntaje))
+            for j, puntaje in zip(mejores, puntajes)
+        ]
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+def get_indice_clausulas():
+    """
+    Devuelve el índice de CLAUSULAS_MAPEADAS, construyéndolo la primera vez.
+    Retorna None si el modelo spaCy no está disponible.
+    """
+    global _indice
+    if _indice is None:
+        with _indice_lock:
+            if _indice is None:
+                keywords = [k for data in CLAUSULAS_MAPEADAS.values() for k in data["keywords"]]
+                docs = procesar_lote(keywords)
+                if docs is None:
+                    return None
+                _indice = IndiceLemasClausulas(CLAUSULAS_MAPEADAS, docs)
+    return _indice
+
+_matriz = None
+_matriz_lock = threading.Lock()
+
+def get_matriz_clausulas():
+    """
+    Devuelve la matriz semántica de CLAUSULAS_MAPEADAS, construyéndola la
+    primera vez. Retorna None si está desactivada o el modelo no tiene vectores.
+    """
+    global _matriz
+    if _matriz is None and MAPEO_SEMANTICO:
+        with _matriz_lock:
+            if _matriz is None:
+                if not tiene_vectores():
+                    return None
+                textos = [f"{data['titulo']} {' '.join(data['keywords'])}" for data in CLAUSULAS_MAPEADAS.values()]
+                docs = procesar_lote(textos)
+                if docs is None:
+                    return None
+                _matriz = MatrizSemanticaClausulas(CLAUSULAS_MAPEADAS, docs)
+    return _matriz
@@ -0,0 +1,120 @@
+# services/contract_detector.py
+"""
+Detección del tipo de contrato en una sola pasada.
+
+Se construye un autómata Aho-Corasick con las claves de CONTRACTS y sus
+"sinonimos". El mensaje se recorre una vez (O(len(texto)) más el número
+de coincidencias) sin importar cuántos tipos o sinónimos tenga el catálogo,
+y en lugar de devolver la primera coincidencia se puntúan todas.
+
+Texto y términos se reducen a palabras separadas por un espacio, sin
+tildes ni palabras vacías: "préstamo de uso", "prestamo_uso" y
+"Préstamo   uso" quedan todos como "prestamo uso".
+"""
+import re
+from collections import deque
+from services.nlp_utils import normalizar_texto
+
+# Palabras que no cambian el tipo ("contrato DE trabajo" = "contrato trabajo")
+PALABRAS_VACIAS = frozenset({
+    "de", "del", "la", "las", "el", "los", "lo", "un", "una", "en", "y", "a", "al", "por", "para", "con",
+})
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes ni signos, sin palabras vacías; '_' separa palabras."""
+    palabras = _PALABRA.findall(normalizar_texto(texto.replace("_", " ")))
+    return " ".join(p for p in palabras if p not in PALABRAS_VACIAS)
+
+
+class AutomataAhoCorasick:
+    """Autómata de búsqueda de múltiples términos a la vez."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._salidas = [[]]
+
+    def agregar(self, termino: str, valor):
+        nodo = 0
+        for c in termino:
+            siguiente = self._goto[nodo].get(c)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto[nodo][c] = siguiente
+                self._goto.append({})
+                self._fail.append(0)
+                self._salidas.append([])
+            nodo = siguiente
+        self._salidas[nodo].append((len(termino), valor))
+
+    def construir(self):
+        """Calcula los enlaces de fallo (BFS) tras agregar todos los términos."""
+        cola = deque(self._goto[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for c, hijo in self._goto[nodo].items():
+                cola.append(hijo)
+                f = self._fail[nodo]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[hijo] = self._goto[f].get(c, 0)
+                self._salidas[hijo].extend(self._salidas[self._fail[hijo]])
+
+    def buscar(self, texto: str):
+        """Genera (inicio, longitud, valor) por cada término encontrado."""
+        nodo = 0
+        goto, fail, salidas = self._goto, self._fail, self._salidas
+        for i, c in enumerate(texto):
+            while nodo and c not in goto[nodo]:
+                nodo = fail[nodo]
+            nodo = goto[nodo].get(c, 0)
+            for longitud, valor in salidas[nodo]:
+                yield i - longitud + 1, longitud, valor
+
+
+class DetectorTipoContrato:
+    """
+    Índice de términos -> tipo de contrato. Solo cuentan las coincidencias
+    de palabras completas ("venta" no coincide dentro de "ventana").
+
+    Cada tipo se puntúa con (palabras del término más largo encontrado,
+    si coincidió el nombre del tipo, número de coincidencias): el término
+    más específico decide antes que la suma de términos sueltos, así
+    "préstamo de uso" es comodato aunque "préstamo" sea de mutuo. A
+    igualdad gana el tipo que aparece primero en el catálogo, que es lo
+    que hacía la búsqueda original en orden.
+    """
+
+    def __init__(self, contracts: dict):
+        self._orden = {tipo: i for i, tipo in enumerate(contracts)}
+        self._automata = AutomataAhoCorasick()
+        for tipo, info in contracts.items():
+            terminos = {normalizar(tipo): True}
+            for sinonimo in info.get("sinonimos", []):
+                terminos.setdefault(normalizar(sinonimo), False)
+            for termino, es_clave in terminos.items():
+                if termino:
+                    valor = (tipo, termino.count(" ") + 1, es_clave)
+                    self._automata.agregar(f" {termino} ", valor)
+        self._automata.construir()
+
+    def puntuar(self, texto: str) -> dict:
+        """Devuelve {tipo: (palabras, es_clave, coincidencias)} para los tipos mencionados."""
+        # Los espacios de los extremos hacen que solo coincidan palabras completas
+        texto_norm = f" {normalizar(texto)} "
+        puntajes = {}
+        for _, _, (tipo, palabras, es_clave) in self._automata.buscar(texto_norm):
+            max_palabras, clave, coincidencias = puntajes.get(tipo, (0, False, 0))
+            puntajes[tipo] = (max(max_palabras, palabras), clave or es_clave, coincidencias + 1)
+        return puntajes
+
+    def detectar(self, texto: str) -> str | None:
+        if not texto:
+            return None
+        puntajes = self.puntuar(texto)
+        if not puntajes:
+            return None
+        return max(puntajes, key=lambda tipo: (puntajes[tipo], -self._orden[tipo]))
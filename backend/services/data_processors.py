@@ -1,14 +1,20 @@
+import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
 from data.contracts_data import DEF_AFFIRMATIVES, DEF_NEGATIVES
-from num2words import num2words
-from datetime import datetime
-import requests
 from datetime import datetime, timedelta
-from dateutil import parser
-from dateparser.search import search_dates
-
-from services.nlp_utils import get_nlp
-nlp = get_nlp()
+from services.montos import (
+    numero_a_letras, monto_en_letras, simbolo_moneda,
+    tokenizar_montos, primer_monto, ROL_RENTA, ROL_GARANTIA,
+)
+from services.fechas import buscar_fecha, parsear_fecha, formatear_fecha_larga, parsear_rango, DESDE_POR, RANGO as PLAZO_RANGO
+from services.geocoding_cache import geocoding_cache
+from services.geocoding_client import get_cliente_geocodificacion
+from services.ubigeo import get_gazetteer
+from services import patrones as P
+from services.patrones import grupo
+from services.processor_registry import RegistroProcesadores, COSTO_BAJO, COSTO_RED
 
 # --- 1. Definición de Funciones de Procesamiento (Reutilizables) ---
 
@@ -17,15 +23,14 @@ def procesar_persona_dni(texto):
     Extrae 'Nombre Completo' y 'DNI' (8 dígitos) de un string.
     Retorna: {"nombre_completo": str, "dni": str}
     """
-    dni_match = re.search(r'(\d{8})', texto)
-    dni = dni_match.group(1) if dni_match else None
+    dni = grupo(P.DNI, texto, default=None)
     nombre = texto
     
     if dni:
         # Remover el DNI del texto para obtener el nombre
         nombre = texto.replace(dni, "").strip()
         # Limpiar puntuación común al final del nombre
-        nombre = re.sub(r'[\.,;]$', '', nombre).strip()
+        nombre = P.PUNTUACION_FINAL.sub('', nombre).strip()
         
     return {"nombre_completo": nombre, "dni": dni}
 
@@ -35,8 +40,8 @@ def procesar_persona_empresa(texto):
     Da prioridad al RUC si ambos patrones coinciden.
     Retorna: {"nombre_razon_social": str, "documento_tipo": str, "documento_numero": str}
     """
-    ruc_match = re.search(r'(\d{11})', texto)
-    dni_match = re.search(r'(\d{8})', texto)
+    ruc_match = P.RUC.search(texto)
+    dni_match = P.DNI.search(texto)
     
     doc_numero = None
     doc_tipo = None
@@ -51,7 +56,7 @@ def procesar_persona_empresa(texto):
 
     if doc_numero:
         nombre = texto.replace(doc_numero, "").strip()
-        nombre = re.sub(r'[\.,;]$', '', nombre).strip()
+        nombre = P.PUNTUACION_FINAL.sub('', nombre).strip()
         
     return {
         "nombre_razon_social": nombre, 
@@ -76,42 +81,43 @@ def procesar_objeto_descripcion(texto):
 def procesar_rango_fecha(texto):
     """
     Extrae fecha de inicio y fin desde un string ("Desde X hasta Y").
-    Usa dateparser para entender lenguaje natural.
+    Usa la gramática de services.fechas y solo recurre a dateparser si no la reconoce.
     Retorna: {"fecha_inicio": str, "fecha_fin": str, "fecha_inicio_larga": str, "fecha_fin_larga": str}
     """
-    partes = re.split(r'\s+(hasta|al)\s+', texto, maxsplit=1, flags=re.IGNORECASE)
+    rango = parsear_rango(texto)
+    if rango:
+        f_inicio, f_fin = rango
+    else:
+        f_inicio, f_fin = _rango_fecha_dateparser(texto)
+
+    return {
+        "fecha_inicio": f_inicio.strftime("%Y-%m-%d") if f_inicio else None,
+        "fecha_fin": f_fin.strftime("%Y-%m-%d") if f_fin else None,
+        "fecha_inicio_larga": formatear_fecha_larga(f_inicio),
+        "fecha_fin_larga": formatear_fecha_larga(f_fin)
+    }
+
+def _rango_fecha_dateparser(texto):
+    """Camino lento: dateparser para expresiones que la gramática no cubre."""
+    import dateparser
+
+    partes = P.SEPARADOR_RANGO.split(texto, maxsplit=1)
     fecha_inicio_str = partes[0].replace("Desde el", "").strip()
     fecha_fin_str = partes[2].strip() if len(partes) > 2 else None
 
     # Configuración para parsear fechas en español (Día/Mes/Año)
     settings = {'DATE_ORDER': 'DMY', 'PREFER_DATES_FROM': 'future'}
     
-    f_inicio = dateparser.parse(fecha_inicio_str, languages=['es'], settings=settings)
+    f_inicio = parsear_fecha(fecha_inicio_str) or dateparser.parse(fecha_inicio_str, languages=['es'], settings=settings)
     
     # Si no se da año para la fecha fin, infiere el de la fecha inicio
     if f_inicio and fecha_fin_str:
-        f_fin = dateparser.parse(fecha_fin_str, languages=['es'], settings=settings)
+        f_fin = parsear_fecha(fecha_fin_str) or dateparser.parse(fecha_fin_str, languages=['es'], settings=settings)
         if f_fin and f_inicio.year > f_fin.year:
              f_fin = f_fin.replace(year=f_inicio.year)
     else:
         f_fin = None
-
-    def format_fecha_larga(fecha_obj):
-        if not fecha_obj: return ""
-        # Cargar locale en español para nombres de meses
-        try:
-            import locale
-            locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-        except locale.Error:
-            pass # Fallback a formato por defecto si locale falla
-        return fecha_obj.strftime("%d de %B de %Y")
-
-    return {
-        "fecha_inicio": f_inicio.strftime("%Y-%m-%d") if f_inicio else None,
-        "fecha_fin": f_fin.strftime("%Y-%m-%d") if f_fin else None,
-        "fecha_inicio_larga": format_fecha_larga(f_inicio),
-        "fecha_fin_larga": format_fecha_larga(f_fin)
-    }
+    return f_inicio, f_fin
 
 def procesar_monto_renta_garantia(texto):
     """
@@ -119,43 +125,23 @@ def procesar_monto_renta_garantia(texto):
     Retorna: {"monto_alquiler_num": float, "monto_alquiler_texto": str, 
               "monto_garantia_num": float, "monto_garantia_texto": str, "moneda": str}
     """
-    monto_alquiler = 0.0
-    monto_garantia = 0.0
-    moneda = "soles" # Moneda por defecto
-
-    # Buscar moneda (soles o dólares)
-    if "dólares" in texto.lower() or "dolares" in texto.lower() or "usd" in texto.lower():
-        moneda = "dólares"
-
-    # Extraer renta (ej: "400 soles mensuales", "renta de 400")
-    match_alquiler = re.search(r'(\d+[\d\.,]*)\s*.*(mensual|renta)', texto, re.IGNORECASE)
-    if not match_alquiler:
-         # Fallback si no dice "mensual" (ej: "se pagan 400")
-         match_alquiler = re.search(r'(\d+[\d\.,]*)', texto)
-         
-    if match_alquiler:
-        monto_alquiler = float(match_alquiler.group(1).replace(",", ""))
-
-    # Extraer garantía (ej: "garantia de 200", "200 de garantia")
-    match_garantia = re.search(r'(garantia|adelanto)\s*(de|)\s*(\d+[\d\.,]*)', texto, re.IGNORECASE)
-    if match_garantia:
-        monto_garantia = float(match_garantia.group(3).replace(",", ""))
-    else:
-        # Fallback (ej: "200 de garantia")
-        match_garantia_alt = re.search(r'(\d+[\d\.,]*)\s*.*(garantia|adelanto)', texto, re.IGNORECASE)
-        if match_garantia_alt:
-             monto_garantia = float(match_garantia_alt.group(1).replace(",", ""))
+    # Una sola pasada: montos con su moneda y su pista de rol (renta/garantía)
+    montos, moneda = tokenizar_montos(texto)
 
-    # Convertir a texto formal
-    # Nota: num2words 'to=currency' es limitado. 'to=spell' es más universal.
-    alquiler_texto = num2words(monto_alquiler, lang='es')
-    garantia_texto = num2words(monto_garantia, lang='es')
+    # Renta: el monto señalado como renta ("400 mensuales", "renta de 400"),
+    # si no, el primero sin pista (ej: "se pagan 400")
+    alquiler = primer_monto(montos, ROL_RENTA) or primer_monto(montos, None)
+    monto_alquiler = alquiler.valor if alquiler else 0.0
+
+    # Garantía: "garantia de 200", "200 de garantia"
+    garantia = primer_monto(montos, ROL_GARANTIA)
+    monto_garantia = garantia.valor if garantia else 0.0
 
     return {
         "monto_alquiler_num": monto_alquiler,
-        "monto_alquiler_texto": f"{alquiler_texto.capitalize()} y 00/100 {moneda}",
+        "monto_alquiler_texto": monto_en_letras(monto_alquiler, moneda),
         "monto_garantia_num": monto_garantia,
-        "monto_garantia_texto": f"{garantia_texto.capitalize()} y 00/100 {moneda}",
+        "monto_garantia_texto": monto_en_letras(monto_garantia, moneda),
         "moneda": moneda.capitalize()
     }
 
@@ -171,18 +157,13 @@ def procesar_monto_condiciones(texto):
     Extrae un monto principal y el texto completo de las condiciones.
     Retorna: {"monto_num": float, "monto_texto": str, "condiciones": str}
     """
-    monto_num = 0.0
-    moneda = "soles"
-    
-    if "dólares" in texto.lower() or "dolares" in texto.lower() or "usd" in texto.lower():
-        moneda = "dólares"
+    # Extraer el primer monto que aparezca
+    montos, moneda = tokenizar_montos(texto)
+    monto_num = montos[0].valor if montos else 0.0
+    if montos and montos[0].moneda:
+        moneda = montos[0].moneda
 
-    # Extraer el primer número que aparezca
-    match_monto = re.search(r'(\d+[\d\.,]*)', texto)
-    if match_monto:
-        monto_num = float(match_monto.group(1).replace(",", ""))
-
-    monto_texto = f"{num2words(monto_num, lang='es').capitalize()} y 00/100 {moneda}"
+    monto_texto = monto_en_letras(monto_num, moneda)
 
     return {
         "monto_num": monto_num,
@@ -193,39 +174,34 @@ def procesar_monto_condiciones(texto):
 def procesar_lugar_fecha(texto):
     """
     Intenta extraer un lugar y una fecha de un string.
-    Usa dateparser.search para encontrar la fecha y asume que el resto es el lugar.
+    Busca la fecha con la gramática de services.fechas (dateparser.search solo
+    si no la reconoce) y asume que el resto es el lugar.
     Retorna: {"lugar": str, "fecha": str, "fecha_larga": str}
     """
-    settings = {'DATE_ORDER': 'DMY', 'PREFER_DATES_FROM': 'future'}
-    
     # Buscar fechas en el texto
-    dates = search_dates(texto, languages=['es'], settings=settings)
+    encontrada = buscar_fecha(texto)
+    if not encontrada:
+        from dateparser.search import search_dates
+        settings = {'DATE_ORDER': 'DMY', 'PREFER_DATES_FROM': 'future'}
+        dates = search_dates(texto, languages=['es'], settings=settings)
+        encontrada = dates[0] if dates else None
     
     fecha_str_encontrada = ""
     fecha_obj = None
     lugar = texto.strip()
 
-    if dates:
+    if encontrada:
         # Tomar la primera fecha encontrada
-        fecha_str_encontrada, fecha_obj = dates[0]
+        fecha_str_encontrada, fecha_obj = encontrada
         # Quitar la fecha del string para obtener el lugar
         lugar = lugar.replace(fecha_str_encontrada, "").strip()
         # Limpiar conectores ("en", "el", ",", "para")
-        lugar = re.sub(r'^(en|el|para|del)\s*|[\.,;]$', '', lugar).strip()
-
-    def format_fecha_larga(fecha_obj):
-        if not fecha_obj: return ""
-        try:
-            import locale
-            locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-        except locale.Error:
-            pass
-        return fecha_obj.strftime("%d de %B de %Y")
+        lugar = P.CONECTORES_LUGAR.sub('', lugar).strip()
 
     return {
         "lugar": lugar,
         "fecha": fecha_obj.strftime("%Y-%m-%d") if fecha_obj else None,
-        "fecha_larga": format_fecha_larga(fecha_obj)
+        "fecha_larga": formatear_fecha_larga(fecha_obj)
     }
 
 def procesar_monto_simple(texto):
@@ -233,17 +209,12 @@ def procesar_monto_simple(texto):
     Extrae un único monto de un string.
     Retorna: {"monto_num": float, "monto_texto": str, "moneda": str}
     """
-    monto_num = 0.0
-    moneda = "soles"
-    
-    if "dólares" in texto.lower() or "dolares" in texto.lower() or "usd" in texto.lower():
-        moneda = "dólares"
+    montos, moneda = tokenizar_montos(texto)
+    monto_num = montos[0].valor if montos else 0.0
+    if montos and montos[0].moneda:
+        moneda = montos[0].moneda
 
-    match_monto = re.search(r'(\d+[\d\.,]*)', texto)
-    if match_monto:
-        monto_num = float(match_monto.group(1).replace(",", ""))
-
-    monto_texto = f"{num2words(monto_num, lang='es').capitalize()} y 00/100 {moneda}"
+    monto_texto = monto_en_letras(monto_num, moneda)
 
     return {
         "monto_num": monto_num,
@@ -264,7 +235,7 @@ def procesar_interes(texto):
         genera_interes = False
     
     # Buscar porcentaje (ej: "5%", "5 por ciento")
-    match_pct = re.search(r'(\d+[\d\.]*)', texto_lower)
+    match_pct = P.PORCENTAJE.search(texto_lower)
     if match_pct:
         porcentaje = float(match_pct.group(1))
 
@@ -275,16 +246,9 @@ def procesar_arrendamiento(datos: dict) -> dict:
     Procesa los datos recolectados del contrato de arrendamiento
     y los estructura según la plantilla Jinja2 'arrendamiento_base.html'.
     """
-    def monto_a_letras(valor):
-        try:
-            valor = float(valor)
-            return num2words(int(valor), lang="es").upper()
-        except:
-            return str(valor).upper()
-
     # --- ARRRENDADOR ---
     arrendador_texto = datos.get("arrendador", "")
-    match_arr = re.search(r"(.+?),\s*DNI\s*(\d+).+domicilio\s*en\s*(.+)", arrendador_texto, re.I)
+    match_arr = P.PERSONA_DNI_DOMICILIO.search(arrendador_texto)
     arrendador = {
         "nombre": match_arr.group(1).strip() if match_arr else arrendador_texto,
         "dni": match_arr.group(2) if match_arr else "",
@@ -294,7 +258,7 @@ def procesar_arrendamiento(datos: dict) -> dict:
 
     # --- ARRENDATARIO ---
     arrendatario_texto = datos.get("arrendatario", "")
-    match_ate = re.search(r"(.+?),\s*DNI\s*(\d+).+domicilio\s*en\s*(.+)", arrendatario_texto, re.I)
+    match_ate = P.PERSONA_DNI_DOMICILIO.search(arrendatario_texto)
     arrendatario = {
         "nombre": match_ate.group(1).strip() if match_ate else arrendatario_texto,
         "dni": match_ate.group(2) if match_ate else "",
@@ -305,29 +269,26 @@ def procesar_arrendamiento(datos: dict) -> dict:
     # --- INMUEBLE ---
     inm_texto = datos.get("inmueble", "")
     inmueble = {
-        "direccion": re.search(r"(Av\.|Jr\.|Calle|Mz|Urbanización|[A-Za-z\s]+)\s+[^\d]*\d*", inm_texto).group(0).strip() if re.search(r"(Av\.|Jr\.|Calle|Mz|Urbanización|[A-Za-z\s]+)\s+[^\d]*\d*", inm_texto) else inm_texto,
-        "distrito": re.search(r"distrito\s+([A-Za-záéíóúñ\s]+)", inm_texto, re.I).group(1).strip().title() if "distrito" in inm_texto.lower() else "",
-        "provincia": re.search(r"provincia\s+([A-Za-záéíóúñ\s]+)", inm_texto, re.I).group(1).strip().title() if "provincia" in inm_texto.lower() else "",
-        "departamento": re.search(r"departamento\s+([A-Za-záéíóúñ\s]+)", inm_texto, re.I).group(1).strip().title() if "departamento" in inm_texto.lower() else "",
-        "partida_electronica": re.search(r"partida\s*(\d+)", inm_texto, re.I).group(1) if "partida" in inm_texto.lower() else "",
-        "zona_registral": re.search(r"zona\s+registral\s+(.+)", inm_texto, re.I).group(1).strip().title() if "zona" in inm_texto.lower() else "",
+        "direccion": grupo(P.INMUEBLE_DIRECCION, inm_texto, 0, inm_texto).strip(),
+        "distrito": grupo(P.INMUEBLE_DISTRITO, inm_texto).strip().title(),
+        "provincia": grupo(P.INMUEBLE_PROVINCIA, inm_texto).strip().title(),
+        "departamento": grupo(P.INMUEBLE_DEPARTAMENTO, inm_texto).strip().title(),
+        "partida_electronica": grupo(P.INMUEBLE_PARTIDA, inm_texto),
+        "zona_registral": grupo(P.INMUEBLE_ZONA_REGISTRAL, inm_texto).strip().title(),
         "destino": datos.get("inmueble_destino", "").lower()
     }
 
     # --- PLAZO ---
     plazo_texto = datos.get("plazo", "")
-    match_plazo = re.search(
-        r"(\d+)\s*años?.*?(\d{1,2}/\d{1,2}/\d{4}).*?(\d{1,2}/\d{1,2}/\d{4}).*?(\d+)\s*d[ií]as.*?(\d+)\s*mes",
-        plazo_texto, re.I
-    )
+    match_plazo = P.PLAZO_ARRENDAMIENTO.search(plazo_texto)
     plazo = {
-        "anios_letras": num2words(int(match_plazo.group(1)), lang="es").upper() if match_plazo else "",
+        "anios_letras": numero_a_letras(int(match_plazo.group(1))).upper() if match_plazo else "",
         "anios_numeros": match_plazo.group(1) if match_plazo else "",
         "fecha_inicio": match_plazo.group(2) if match_plazo else "",
         "fecha_fin": match_plazo.group(3) if match_plazo else "",
-        "preaviso_dias_letras": num2words(int(match_plazo.group(4)), lang="es").upper() if match_plazo else "",
+        "preaviso_dias_letras": numero_a_letras(int(match_plazo.group(4))).upper() if match_plazo else "",
         "preaviso_dias_numeros": match_plazo.group(4) if match_plazo else "",
-        "penalidad_meses_letras": num2words(int(match_plazo.group(5)), lang="es").upper() if match_plazo else ""
+        "penalidad_meses_letras": numero_a_letras(int(match_plazo.group(5))).upper() if match_plazo else ""
     }
 
     # --- RENTA ---
@@ -336,12 +297,12 @@ def procesar_arrendamiento(datos: dict) -> dict:
     # --- PAGO ---
     pago_texto = datos.get("pago", "")
     pago = {
-        "dia_limite_texto": re.search(r"(primer|segundo|tercer|cuarto|quinto|sexto|s[eé]ptimo)", pago_texto, re.I).group(1).upper() if re.search(r"(primer|segundo|tercer|cuarto|quinto|sexto|s[eé]ptimo)", pago_texto, re.I) else "QUINTO",
-        "meses_incumplimiento_resolucion": re.search(r"(\d+)\s*mes", pago_texto, re.I).group(1) if "mes" in pago_texto.lower() else "2",
+        "dia_limite_texto": grupo(P.DIA_ORDINAL, pago_texto, default="quinto").upper(),
+        "meses_incumplimiento_resolucion": grupo(P.MESES_CANTIDAD, pago_texto, default="2"),
         "cuenta": {
-            "tipo": re.search(r"(ahorros|corriente)", pago_texto, re.I).group(1).upper() if re.search(r"(ahorros|corriente)", pago_texto, re.I) else "CUENTA DE AHORROS",
-            "numero": re.search(r"(\d[\d-]+)", pago_texto).group(1) if re.search(r"(\d[\d-]+)", pago_texto) else "",
-            "banco": re.search(r"(BCP|BBVA|INTERBANK|SCOTIABANK|BANCO|FINANCIERA)\s*[A-Z]*", pago_texto, re.I).group(1).upper() if re.search(r"(BCP|BBVA|INTERBANK|SCOTIABANK|BANCO|FINANCIERA)", pago_texto, re.I) else ""
+            "tipo": grupo(P.TIPO_CUENTA, pago_texto, default="CUENTA DE AHORROS").upper(),
+            "numero": grupo(P.NUMERO_CUENTA_GUIONES, pago_texto),
+            "banco": grupo(P.BANCO, pago_texto).upper()
         }
     }
 
@@ -405,18 +366,19 @@ def procesar_renta(valor: str) -> dict:
         }
 
     texto = valor.lower()
-    moneda = "S/"
+    montos, moneda = tokenizar_montos(texto)
+    moneda = simbolo_moneda(moneda)
     periodo = "mensuales" if "mensuales" in texto else "mensual"
 
     # 🔍 Buscar el primer monto de pago (renta)
-    match_renta = re.search(r"(\d+(?:\.\d+)?)\s*(?:soles?)", texto)
-    monto_renta = float(match_renta.group(1)) if match_renta else 0
-    monto_letras = num2words(int(monto_renta), lang='es').capitalize() if monto_renta else "No especificado"
+    renta = primer_monto(montos, ROL_RENTA) or primer_monto(montos, None)
+    monto_renta = renta.valor if renta else 0
+    monto_letras = numero_a_letras(int(monto_renta)).capitalize() if monto_renta else "No especificado"
 
     # 🔍 Buscar posible monto de garantía
-    match_garantia = re.search(r"garant[ií]a.*?(\d+(?:\.\d+)?)\s*(?:soles?)", texto)
-    monto_garantia = float(match_garantia.group(1)) if match_garantia else 0
-    monto_garantia_letras = num2words(int(monto_garantia), lang='es').capitalize() if monto_garantia else "No especificada"
+    garantia = primer_monto(montos, ROL_GARANTIA)
+    monto_garantia = garantia.valor if garantia else 0
+    monto_garantia_letras = numero_a_letras(int(monto_garantia)).capitalize() if monto_garantia else "No especificada"
 
     # Estructura final compatible con Jinja
     return {
@@ -444,25 +406,25 @@ def procesar_pago(valor: str) -> dict:
     texto = valor.strip().lower()
 
     # --- 1. Día de pago ---
-    match_dia = re.search(r'\b(\d{1,2})\b\s*(?:de\s*cada\s*mes|día|dia)?', texto)
+    match_dia = P.DIA_PAGO.search(texto)
     if match_dia:
         dia_num = int(match_dia.group(1))
-        dia_texto = num2words(dia_num, lang='es').capitalize()
+        dia_texto = numero_a_letras(dia_num).capitalize()
     else:
         dia_num = 5
         dia_texto = "Quinto"  # valor por defecto
 
     # --- 2. Meses de incumplimiento (ej: “2 meses de deuda”) ---
-    match_meses = re.search(r'(\d+)\s*mes', texto)
+    match_meses = P.MESES_CANTIDAD.search(texto)
     if match_meses:
         meses_num = int(match_meses.group(1))
-        meses_texto = num2words(meses_num, lang='es').capitalize()
+        meses_texto = numero_a_letras(meses_num).capitalize()
     else:
         meses_num = 2
         meses_texto = "Dos"
 
     # --- 3. Número de cuenta bancaria ---
-    cuenta_match = re.search(r'(\d{8,20})', texto)
+    cuenta_match = P.NUMERO_CUENTA.search(texto)
     cuenta_numero = cuenta_match.group(1) if cuenta_match else "No especificado"
 
     # --- 4. Tipo de cuenta ---
@@ -503,11 +465,7 @@ def procesar_persona_con_dni_direccion(valor: str) -> dict:
     """
     texto = valor.strip()
     # Buscar DNI de 8 dígitos
-    match = re.search(r'\b(\d{8})\b', texto)
-    if match:
-        dni = match.group(1)
-    else:
-        dni = ""
+    dni = grupo(P.DNI_AISLADO, texto)
     # Dividir nombre vs lo demás
     partes = texto.split(dni) if dni else [texto]
     
@@ -525,36 +483,59 @@ def procesar_inmueble(texto: str):
     Procesa una descripción del inmueble usando la API de Nominatim (OpenStreetMap).
     Ejemplo: "Calle Leoncio Prado 166, en Sullana, Sullana, Piura"
     Devuelve un diccionario estructurado con dirección, distrito, provincia y departamento.
+    Las respuestas (y las direcciones no encontradas) se guardan en geocoding_cache.
+    Si el gazetteer local de ubigeos identifica un distrito confirmado por su
+    provincia o departamento, no se consulta la red; un nombre suelto solo
+    sirve de pista para el fallback. Los errores de Nominatim se propagan;
+    una dirección no encontrada usa el fallback local.
     """
     texto_original = texto.strip()
     texto_busqueda = limpiar_direccion(texto_original)
 
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {"q": texto_busqueda, "format": "json", "addressdetails": 1}
-    headers = {"User-Agent": "ChatNotarial/1.0"}
+    ubigeo = get_gazetteer().resolver(texto_original)
+    if ubigeo and ubigeo["completo"]:
+        return {
+            "direccion": texto_busqueda,
+            "distrito": ubigeo["distrito"],
+            "provincia": ubigeo["provincia"],
+            "departamento": ubigeo["departamento"],
+            "pais": "Perú",
+            "texto_busqueda": texto_busqueda,
+            "ubigeo": ubigeo["ubigeo"]
+        }
 
-    try:
-        resp = requests.get(url, params=params, headers=headers, timeout=8)
-        if resp.status_code == 200 and resp.json():
-            data = resp.json()[0]["address"]
-            return {
-                "direccion": texto_busqueda,
-                "distrito": data.get("city_district") or data.get("suburb") or data.get("town") or data.get("city") or "",
-                "provincia": data.get("county") or data.get("state_district") or data.get("region") or "",
-                "departamento": data.get("state") or "",
-                "pais": data.get("country", "Perú"),
-                "texto_busqueda": texto_busqueda
-            }
-        else:
-            return _fallback_inmueble(texto_original)
+    encontrado, data = geocoding_cache.obtener(texto_busqueda)
+    if not encontrado:
+        # Un error de red o el circuito abierto se propagan: procesar_campos
+        # usa _fallback_inmueble y marca el campo como degradado, así se
+        # vuelve a consultar en la próxima vista previa
+        data = _consultar_nominatim(texto_busqueda)
+        geocoding_cache.guardar(texto_busqueda, data)
 
-    except Exception as e:
-        print(f"⚠️ Error en procesar_inmueble (API Nominatim): {e}")
+    if not data:
         return _fallback_inmueble(texto_original)
 
+    return {
+        "direccion": texto_busqueda,
+        "distrito": data.get("city_district") or data.get("suburb") or data.get("town") or data.get("city") or "",
+        "provincia": data.get("county") or data.get("state_district") or data.get("region") or "",
+        "departamento": data.get("state") or "",
+        "pais": data.get("country", "Perú"),
+        "texto_busqueda": texto_busqueda
+    }
+
+def _consultar_nominatim(texto_busqueda: str):
+    """
+    Devuelve el bloque "address" del primer resultado, o None si Nominatim
+    no encontró la dirección. Los errores de red o HTTP (y el circuito
+    abierto del cliente) se propagan.
+    """
+    return get_cliente_geocodificacion().buscar(texto_busqueda)
+
 def _fallback_inmueble(texto: str):
     """
-    Fallback local (sin API). Divide la cadena por comas.
+    Fallback local (sin API). Divide la cadena por comas y corrige las
+    divisiones administrativas con el gazetteer de ubigeos.
     """
     partes = [p.strip().replace("en ", "").replace("En ", "") for p in texto.split(",") if p.strip()]
     resultado = {
@@ -573,6 +554,17 @@ def _fallback_inmueble(texto: str):
     elif len(partes) == 1:
         resultado["direccion"] = partes[0]
 
+    # Completar con el gazetteer local lo que se haya podido reconocer: un
+    # distrito confirmado corrige la división por comas; uno sin confirmar
+    # solo rellena los campos vacíos
+    ubigeo = get_gazetteer().resolver(texto)
+    if ubigeo and not ubigeo["ambiguo"]:
+        for campo in ("distrito", "provincia", "departamento"):
+            if ubigeo[campo] and (ubigeo["confirmado"] or not resultado[campo]):
+                resultado[campo] = ubigeo[campo]
+        if ubigeo["confirmado"]:
+            resultado["ubigeo"] = ubigeo["ubigeo"]
+
     return resultado
 
 def limpiar_direccion(texto_original: str) -> str:
@@ -585,23 +577,24 @@ def limpiar_direccion(texto_original: str) -> str:
     if not texto_original:
         return ""
     
-    texto = re.sub(r"\b[Ee]n\b", "", texto_original)
+    texto = P.PALABRA_EN.sub("", texto_original)
 
     # 2️⃣ Reemplazar comas por espacios y limpiar espacios extra
     texto = texto.replace(",", " ")
-    texto = re.sub(r"\s+", " ", texto).strip()
-
-    # 3️⃣ Quitar palabras duplicadas (ej: "Sullana Sullana")
-    partes = texto.split(" ")
-    partes_unicas = []
-    for palabra in partes:
-        if palabra.lower() not in [p.lower() for p in partes_unicas]:
-            partes_unicas.append(palabra)
-    texto = " ".join(partes_unicas)
-    partes = texto.split()
+    texto = P.ESPACIOS.sub(" ", texto).strip()
+
+    # 3️⃣ Quitar palabras duplicadas (ej: "Sullana Sullana"), en una pasada
+    vistas = set()
+    partes = []
+    for palabra in texto.split(" "):
+        clave = palabra.lower()
+        if clave not in vistas:
+            vistas.add(clave)
+            partes.append(palabra)
+    texto = " ".join(partes)
     if len(partes) >= 4:
         ultimas = partes[-3:]
-        if all(re.match(r"^[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+$", p) for p in ultimas):
+        if all(P.NOMBRE_PROPIO.match(p) for p in ultimas):
             texto = " ".join(partes[:-2])
 
     return texto.strip()
@@ -617,46 +610,32 @@ def procesar_plazo(valor: str) -> dict:
     meses_duracion = 0
     anios_duracion = 0
 
-    # --- Diccionario de meses en español a inglés ---
-    meses_es = {
-        "enero": "January", "febrero": "February", "marzo": "March", "abril": "April",
-        "mayo": "May", "junio": "June", "julio": "July", "agosto": "August",
-        "septiembre": "September", "setiembre": "September", "octubre": "October",
-        "noviembre": "November", "diciembre": "December"
-    }
-
-    def traducir_mes(fecha_texto: str):
-        for esp, eng in meses_es.items():
-            fecha_texto = re.sub(rf"\b{esp}\b", eng, fecha_texto, flags=re.IGNORECASE)
-        return fecha_texto
-
     # --- Caso 1: "Del ... al ..." ---
-    match_rango = re.search(r"(?i)del\s+(.*?)\s+al\s+(.*)", texto)
+    match_rango = PLAZO_RANGO.search(texto)
     if match_rango:
         fecha_inicio = match_rango.group(1).strip()
         fecha_fin = match_rango.group(2).strip()
 
     # --- Caso 2: "Desde el ... por X meses/años" ---
     else:
-        match_desde = re.search(r"(?i)desde\s+el\s+(.*?)\s+por\s+(\d+)\s*(mes(?:es)?|año(?:s)?)", texto)
+        match_desde = DESDE_POR.search(texto)
         if match_desde:
-            fecha_inicio = match_desde.group(1).strip()
-            cantidad = int(match_desde.group(2))
-            unidad = match_desde.group(3).lower()
+            fecha_inicio = match_desde.group("inicio").strip()
+            cantidad = int(match_desde.group("cantidad"))
+            unidad = match_desde.group("unidad").lower()
             if "año" in unidad:
                 anios_duracion = cantidad
             else:
                 meses_duracion = cantidad
 
-            # Calcular fecha fin con meses traducidos
+            # Calcular fecha fin (gramática propia; dateutil solo si no la reconoce)
             try:
-                fecha_inicio_en = traducir_mes(fecha_inicio)
-                fecha_inicio_dt = parser.parse(fecha_inicio_en, dayfirst=True)
+                fecha_inicio_dt = parsear_fecha(fecha_inicio) or _parsear_fecha_dateutil(fecha_inicio)
                 if anios_duracion:
                     fecha_fin_dt = fecha_inicio_dt.replace(year=fecha_inicio_dt.year + anios_duracion)
                 else:
                     fecha_fin_dt = fecha_inicio_dt + timedelta(days=meses_duracion * 30)
-                fecha_fin = fecha_fin_dt.strftime("%d de %B de %Y").capitalize()
+                fecha_fin = formatear_fecha_larga(fecha_fin_dt)
             except Exception as e:
                 print(f"Error calculando fecha fin: {e}")
 
@@ -668,44 +647,169 @@ def procesar_plazo(valor: str) -> dict:
         "fecha_inicio": fecha_inicio or "No especificada",
         "fecha_fin": fecha_fin or "No especificada",
         "anios_numeros": anios_duracion,
-        "anios_letras": num2words(anios_duracion, lang="es").capitalize() if anios_duracion else "Cero",
+        "anios_letras": numero_a_letras(anios_duracion).capitalize() if anios_duracion else "Cero",
         "meses_numeros": meses_duracion,
-        "meses_letras": num2words(meses_duracion, lang="es").capitalize() if meses_duracion else "Cero",
+        "meses_letras": numero_a_letras(meses_duracion).capitalize() if meses_duracion else "Cero",
         "preaviso_dias_numeros": preaviso_dias,
-        "preaviso_dias_letras": num2words(preaviso_dias, lang="es").capitalize(),
-        "penalidad_meses_letras": num2words(penalidad_meses, lang="es").capitalize()
+        "preaviso_dias_letras": numero_a_letras(preaviso_dias).capitalize(),
+        "penalidad_meses_letras": numero_a_letras(penalidad_meses).capitalize()
     }
 
+def _parsear_fecha_dateutil(fecha_texto: str):
+    """Camino lento de procesar_plazo: traduce los meses al inglés y usa dateutil."""
+    from dateutil import parser
+
+    for ingles, patron in _MESES_A_INGLES:
+        fecha_texto = patron.sub(ingles, fecha_texto)
+    return parser.parse(fecha_texto, dayfirst=True)
+
+_MESES_A_INGLES = [
+    (eng, re.compile(rf"\b{esp}\b", re.IGNORECASE))
+    for esp, eng in {
+        "enero": "January", "febrero": "February", "marzo": "March", "abril": "April",
+        "mayo": "May", "junio": "June", "julio": "July", "agosto": "August",
+        "septiembre": "September", "setiembre": "September", "octubre": "October",
+        "noviembre": "November", "diciembre": "December"
+    }.items()
+]
+
 # --- 2. El Registro de Procesadores ---
 
-PROCESSOR_REGISTRY = {
-    # Contratos generales
-    "mutuo": procesar_monto_simple,
-    "reconocimiento_deuda": procesar_monto_simple,
-    "arrendamiento": procesar_arrendamiento,
-
-    # Tipos de dato usados en varios contratos
-    "persona_dni": procesar_persona_dni,
-    "persona_empresa": procesar_persona_empresa,
-    "direccion_descripcion": procesar_direccion_descripcion,
-    "objeto_descripcion": procesar_objeto_descripcion,
-    "texto_simple": procesar_texto_simple,
-    "lugar_fecha": procesar_lugar_fecha,
-    "interes": procesar_interes,
-
-    # Datos específicos de arrendamiento
-    "rango_fecha": procesar_rango_fecha,
-    "monto_renta_garantia": procesar_monto_renta_garantia,
-    "renta": procesar_renta,
-    "pago": procesar_pago,
-    "arrendador": procesar_persona_con_dni_direccion,
-    "arrendatario": procesar_persona_con_dni_direccion,
-    "inmueble": procesar_inmueble,
-    "plazo": procesar_plazo,
-    
-    # Datos de prestación de servicios
-    "monto_condiciones": procesar_monto_condiciones,
+# Presupuesto de tiempo (segundos) de los procesadores que pasan por el pool
+PROCESADOR_TIMEOUT_S = float(os.getenv("PROCESADOR_TIMEOUT_S", "2"))
+PROCESADOR_TIMEOUT_RED_S = float(os.getenv("PROCESADOR_TIMEOUT_INMUEBLE_S", "4"))
+
+# Las fechas sin año se resuelven respecto de hoy: se recalculan cada día
+TTL_FECHAS_S = 24 * 3600
+
+# Versión de los procesadores que escriben montos o números en letras
+# (services.montos): subirla al cambiar el formateador o el tokenizador
+# 2: "veintiún mil" en lugar de "veintiuno mil"
+# 3: miles separados por espacio, sin duraciones ni "s/" dentro de palabras
+VERSION_MONTOS = 3
+
+PROCESSOR_REGISTRY = RegistroProcesadores()
+_registrar = PROCESSOR_REGISTRY.registrar
+
+# Contratos generales
+_registrar("mutuo", procesar_monto_simple, version=VERSION_MONTOS)
+_registrar("reconocimiento_deuda", procesar_monto_simple, version=VERSION_MONTOS)
+_registrar("arrendamiento", procesar_arrendamiento, version=VERSION_MONTOS)
+
+# Tipos de dato usados en varios contratos
+_registrar("persona_dni", procesar_persona_dni)
+_registrar("persona_empresa", procesar_persona_empresa)
+_registrar("direccion_descripcion", procesar_direccion_descripcion)
+_registrar("objeto_descripcion", procesar_objeto_descripcion)
+_registrar("texto_simple", procesar_texto_simple)
+_registrar("lugar_fecha", procesar_lugar_fecha, ttl=TTL_FECHAS_S)
+_registrar("interes", procesar_interes)
+
+# Datos específicos de arrendamiento
+_registrar("rango_fecha", procesar_rango_fecha, ttl=TTL_FECHAS_S)
+_registrar("monto_renta_garantia", procesar_monto_renta_garantia, version=VERSION_MONTOS)
+_registrar("renta", procesar_renta, version=VERSION_MONTOS)
+_registrar("pago", procesar_pago, version=VERSION_MONTOS)
+_registrar("arrendador", procesar_persona_con_dni_direccion)
+_registrar("arrendatario", procesar_persona_con_dni_direccion)
+# Consulta Nominatim (con su propia caché persistente): no se memoriza aquí
+# version 2: el gazetteer solo evita la red con distritos confirmados
+_registrar("inmueble", procesar_inmueble, puro=False, costo=COSTO_RED,
+           timeout=PROCESADOR_TIMEOUT_RED_S, fallback=_fallback_inmueble, version=2)
+_registrar("plazo", procesar_plazo, ttl=TTL_FECHAS_S, version=VERSION_MONTOS)
+
+# Datos de prestación de servicios
+_registrar("monto_condiciones", procesar_monto_condiciones, version=VERSION_MONTOS)
+
+# Mutuo o simples
+_registrar("monto_simple", procesar_monto_simple, version=VERSION_MONTOS)
+
+# --- 3. Ejecución concurrente de los procesadores ---
+
+# Hilos compartidos por todas las vistas previas del proceso
+PROCESADORES_WORKERS = int(os.getenv("PROCESADORES_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=PROCESADORES_WORKERS, thread_name_prefix="procesador")
+
+
+def _fallback(procesador, raw_value, motivo):
+    if procesador.fallback:
+        try:
+            return procesador.fallback(raw_value)
+        except Exception as e:
+            motivo = f"{motivo}; fallback: {e}"
+    return {"error": motivo}
+
+
+def _en_linea(procesador):
+    """Los procesadores puros de CPU local corren en el hilo del request."""
+    return procesador.puro and procesador.costo == COSTO_BAJO
+
+
+def procesar_campos(campos):
+    """
+    Ejecuta los procesadores de varios campos.
+
+    campos: lista de (key, tipo_dato, raw_value).
+    Retorna ({key: valor_procesado}, {keys degradadas}). Los tipos sin procesador conservan el
+    valor crudo y los resultados ya memorizados se usan directamente. Solo
+    los procesadores de red (o impuros) pasan por el pool, con su tiempo
+    límite contado desde que se encolan; los puros de costo bajo corren en
+    línea mientras tanto, así no compiten por hilos del pool ni se degradan
+    por esperar en su cola. Un procesador del pool que falla o excede su
+    presupuesto se sustituye por su fallback (o {"error": ...}) y, si aún
+    no empezó, se cancela.
+
+    El presupuesto de tiempo no se aplica a los procesadores en línea: no
+    se pueden interrumpir y su resultado ya es correcto (y queda
+    memorizado), así que solo se degradan si fallan. Si uno tarda más que
+    su presupuesto se registra en el log, para detectar una regla lenta.
+    """
+    resultados = {}
+    degradados = set()
+    en_linea = []
+    futuros = []
+    for key, tipo_dato, raw_value in campos:
+        procesador = PROCESSOR_REGISTRY.metadatos(tipo_dato)
+        if not procesador:
+            resultados[key] = raw_value
+            continue
+        encontrado, resultado = PROCESSOR_REGISTRY.en_cache(tipo_dato, raw_value)
+        if encontrado:
+            resultados[key] = resultado
+        elif _en_linea(procesador):
+            en_linea.append((key, tipo_dato, procesador, raw_value))
+        else:
+            futuro = _executor.submit(PROCESSOR_REGISTRY.ejecutar, tipo_dato, raw_value)
+            futuros.append((key, procesador, raw_value, futuro, time.monotonic()))
 
-    # Mutuo o simples
-    "monto_simple": procesar_monto_simple,
-}
+    for key, tipo_dato, procesador, raw_value in en_linea:
+        inicio = time.monotonic()
+        try:
+            resultados[key] = PROCESSOR_REGISTRY.ejecutar(tipo_dato, raw_value)
+            limite = procesador.timeout or PROCESADOR_TIMEOUT_S
+            if time.monotonic() - inicio > limite:
+                print(f"⏱️ Procesador en línea de {key} tardó {time.monotonic() - inicio:.1f}s (presupuesto {limite:.1f}s).")
+        except Exception as e:
+            print(f"Error procesando {key}: {e}")
+            resultados[key] = _fallback(procesador, raw_value, str(e))
+            degradados.add(key)
+
+    for key, procesador, raw_value, futuro, encolado in futuros:
+        limite = procesador.timeout or PROCESADOR_TIMEOUT_S
+        try:
+            resultados[key] = futuro.result(timeout=max(0.0, encolado + limite - time.monotonic()))
+        except FuturoTimeout:
+            # Si seguía en cola no llega a ejecutarse; si ya corría, termina
+            # (p. ej. el geocoding llena su caché para la próxima vista previa)
+            futuro.cancel()
+            print(f"⏱️ Procesador de {key} excedió {limite:.1f}s, usando fallback.")
+            resultados[key] = _fallback(procesador, raw_value, f"Tiempo excedido ({limite:.1f}s)")
+            degradados.add(key)
+        except Exception as e:
+            print(f"Error procesando {key}: {e}")
+            resultados[key] = _fallback(procesador, raw_value, str(e))
+            degradados.add(key)
+
+    # Mantener el orden de las preguntas
+    return {key: resultados[key] for key, _, _ in campos}, degradados
@@ -0,0 +1,173 @@
+# services/document_store.py
+"""
+Almacén de documentos direccionado por contenido.
+
+Cada artefacto del contrato (HTML renderizado, PDF) se guarda bajo su
+SHA-256, calculado mientras se escribe por bloques, sin
+cargar el archivo completo en memoria. Un contenido idéntico se guarda
+una sola vez. registrar_evidencia crea la Evidencia "Hash SHA-256" del
+contrato (una por digest).
+
+    DOCUMENT_STORE_DIR/ab/ab12...ef.pdf  ->  /documento/objeto/ab12...ef.pdf
+"""
+import os
+import re
+import hashlib
+import tempfile
+
+DOCUMENT_STORE_DIR = os.path.abspath(os.getenv(
+    "DOCUMENT_STORE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "storage", "objetos")
+))
+URL_OBJETOS = "/documento/objeto"
+TIPO_EVIDENCIA_HASH = "Hash SHA-256"
+
+_NOMBRE_OBJETO = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]{1,8})?$")
+
+
+class Objeto:
+    __slots__ = ("digest", "extension", "tamano", "nuevo")
+
+    def __init__(self, digest, extension, tamano, nuevo):
+        self.digest = digest
+        self.extension = extension
+        self.tamano = tamano
+        self.nuevo = nuevo
+
+    @property
+    def nombre(self):
+        return f"{self.digest}{self.extension}"
+
+    @property
+    def url(self):
+        return f"{URL_OBJETOS}/{self.nombre}"
+
+
+def ruta_objeto(nombre: str) -> str | None:
+    """Ruta en disco de un objeto por su nombre (digest + extensión), o None si no es válido."""
+    if not _NOMBRE_OBJETO.match(nombre or ""):
+        return None
+    return os.path.join(DOCUMENT_STORE_DIR, nombre[:2], nombre)
+
+
+class EscritorObjeto:
+    """
+    Archivo temporal que va calculando el SHA-256 de lo que se escribe.
+    Sirve como destino de write_pdf, shutil.copyfileobj, etc. Al cerrarlo
+    se mueve a su ruta definitiva, o se descarta si ya existía.
+    """
+
+    def __init__(self, extension: str = ""):
+        self.extension = extension
+        self.objeto = None
+        self._hash = hashlib.sha256()
+        self._tamano = 0
+        os.makedirs(DOCUMENT_STORE_DIR, exist_ok=True)
+        fd, self._temporal = tempfile.mkstemp(dir=DOCUMENT_STORE_DIR, suffix=".tmp")
+        self._archivo = os.fdopen(fd, "wb")
+
+    def write(self, datos):
+        if isinstance(datos, str):
+            datos = datos.encode("utf-8")
+        self._hash.update(datos)
+        self._tamano += len(datos)
+        return self._archivo.write(datos)
+
+    def flush(self):
+        self._archivo.flush()
+
+    def close(self):
+        if self.objeto is not None:
+            return self.objeto
+        self._archivo.close()
+        digest = self._hash.hexdigest()
+        destino = ruta_objeto(f"{digest}{self.extension}")
+        nuevo = not os.path.exists(destino)
+        if nuevo:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(self._temporal, destino)
+        else:
+            os.remove(self._temporal)
+        self.objeto = Objeto(digest, self.extension, self._tamano, nuevo)
+        return self.objeto
+
+    def descartar(self):
+        self._archivo.close()
+        if os.path.exists(self._temporal):
+            os.remove(self._temporal)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.close()
+        else:
+            self.descartar()
+
+
+def guardar_stream(fragmentos, extension: str = "") -> Objeto:
+    """Guarda un iterable de fragmentos (bytes o str), p. ej. una plantilla en streaming."""
+    with EscritorObjeto(extension) as escritor:
+        for fragmento in fragmentos:
+            escritor.write(fragmento)
+    return escritor.objeto
+
+
+def guardar_bytes(datos, extension: str = "") -> Objeto:
+    """
+    Contenido ya en memoria (HTML renderizado): se calcula el hash primero
+    y solo se escribe si el objeto no existe.
+    """
+    if isinstance(datos, str):
+        datos = datos.encode("utf-8")
+    digest = hashlib.sha256(datos).hexdigest()
+    if os.path.exists(ruta_objeto(f"{digest}{extension}")):
+        return Objeto(digest, extension, len(datos), False)
+    return guardar_stream((datos,), extension)
+
+
+def registrar_evidencia(contrato_id: int, objeto: Objeto, artefacto: str, firmante_id=None):
+    """
+    Crea (sin commit) la Evidencia "Hash SHA-256" del objeto para el
+    contrato, salvo que ya exista una con el mismo digest. Retorna la
+    Evidencia, nueva o existente.
+    """
+    from flask import current_app
+    from database import db
+    from models import Evidencia, TipoEvidencia
+
+    tipo = TipoEvidencia.query.filter_by(descripcion=TIPO_EVIDENCIA_HASH).first()
+    if not tipo:
+        current_app.logger.warning("Creando TipoEvidencia faltante: %s", TIPO_EVIDENCIA_HASH)
+        tipo = TipoEvidencia(descripcion=TIPO_EVIDENCIA_HASH)
+        db.session.add(tipo)
+        db.session.flush()
+
+    existente = Evidencia.query.filter(
+        Evidencia.contrato_id == contrato_id,
+        Evidencia.tipo_id == tipo.id,
+        Evidencia.metadatos["sha256"].astext == objeto.digest,
+    ).first()
+    if existente:
+        return existente
+
+    evidencia = Evidencia(
+        contrato_id=contrato_id,
+        firmante_id=firmante_id,
+        tipo_id=tipo.id,
+        url=objeto.url,
+        metadatos={"sha256": objeto.digest, "artefacto": artefacto, "bytes": objeto.tamano},
+    )
+    db.session.add(evidencia)
+    return evidencia
+
+
+def objeto_de_usuario(nombre: str, usuario_id: int) -> bool:
+    """Indica si el objeto está registrado como evidencia de un contrato creado por el usuario."""
+    from models import Evidencia, Contrato
+
+    return Evidencia.query.join(Contrato, Evidencia.contrato_id == Contrato.id).filter(
+        Evidencia.url == f"{URL_OBJETOS}/{nombre}",
+        Contrato.creador_id == usuario_id,
+    ).first() is not None
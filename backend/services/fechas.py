@@ -0,0 +1,145 @@
+# services/fechas.py
+"""
+Gramática de fechas en español, precompilada, y formato de fecha larga.
+
+Cubre en una sola pasada de regex las formas más comunes en las respuestas
+("30 de octubre de 2025", "01/11/2025", "del X al Y", "desde el X por
+6 meses"). Los procesadores solo recurren a dateparser cuando esta
+gramática no reconoce el texto.
+"""
+import re
+from datetime import datetime
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12,
+    "ene": 1, "feb": 2, "mar": 3, "abr": 4, "may": 5, "jun": 6, "jul": 7,
+    "ago": 8, "sep": 9, "set": 9, "oct": 10, "nov": 11, "dic": 12,
+}
+
+# Índice = número de mes; para formatear sin depender del locale del sistema
+NOMBRES_MES = (
+    "", "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+)
+
+_MES = "|".join(sorted(MESES, key=len, reverse=True))
+
+# "30 de octubre de 2025", "1 de enero", "1ro de enero del 2025", "15 oct. 2025"
+_FECHA_TEXTO = (
+    rf"(?P<dia>\d{{1,2}})(?:ro|º|°)?\s+(?:de\s+)?(?P<mes>{_MES})\.?"
+    rf"(?:,?\s+(?:de(?:l)?\s+)?(?P<anio>\d{{4}}))?"
+)
+# "01/11/2025", "1-11-25"
+_FECHA_NUMERICA = r"(?P<dia_n>\d{1,2})[/\-.](?P<mes_n>\d{1,2})[/\-.](?P<anio_n>\d{4}|\d{2})"
+
+FECHA = re.compile(rf"\b(?:{_FECHA_TEXTO}|{_FECHA_NUMERICA})\b", re.IGNORECASE)
+
+# "del 1 de enero al 30 de junio de 2025", "desde el X hasta Y"
+RANGO = re.compile(r"(?:\bdel|\bdesde(?:\s+el)?)\s+(?P<inicio>.*?)\s+(?:al|hasta(?:\s+el)?)\s+(?P<fin>.*)", re.IGNORECASE)
+
+# "desde el 30 de octubre de 2025 por 6 meses"
+DESDE_POR = re.compile(r"desde\s+el\s+(?P<inicio>.*?)\s+por\s+(?P<cantidad>\d+)\s*(?P<unidad>mes(?:es)?|años?)", re.IGNORECASE)
+
+# Conectores que pueden preceder a una fecha aislada
+_PREFIJO_FECHA = re.compile(r"^(?:desde\s+)?(?:el\s+)?", re.IGNORECASE)
+
+
+def _construir(dia, mes, anio, referencia=None):
+    """Crea el datetime; sin año, toma la próxima ocurrencia (fechas futuras)."""
+    if anio is None:
+        referencia = referencia or datetime.now()
+        fecha = datetime(referencia.year, mes, dia)
+        if fecha.date() < referencia.date():
+            fecha = fecha.replace(year=referencia.year + 1)
+        return fecha
+    if anio < 100:
+        anio += 2000
+    return datetime(anio, mes, dia)
+
+
+def _desde_match(m, referencia=None):
+    try:
+        if m.group("mes"):
+            anio = m.group("anio")
+            return _construir(int(m.group("dia")), MESES[m.group("mes").lower()],
+                              int(anio) if anio else None, referencia)
+        return _construir(int(m.group("dia_n")), int(m.group("mes_n")), int(m.group("anio_n")), referencia)
+    except ValueError:
+        # Día o mes fuera de rango (ej. 31/02/2025)
+        return None
+
+
+def buscar_fecha(texto: str, referencia=None):
+    """
+    Primera fecha reconocida dentro del texto.
+    Retorna (texto_encontrado, datetime) o None.
+    """
+    for m in FECHA.finditer(texto or ""):
+        fecha = _desde_match(m, referencia)
+        if fecha:
+            return m.group(0), fecha
+    return None
+
+
+def _parsear(texto: str, referencia=None):
+    """(datetime, trae_año) para un texto que es solo una fecha, o None."""
+    limpio = _PREFIJO_FECHA.sub("", (texto or "").strip()).rstrip(" .,;")
+    m = FECHA.fullmatch(limpio)
+    if not m:
+        return None
+    fecha = _desde_match(m, referencia)
+    if not fecha:
+        return None
+    return fecha, not m.group("mes") or m.group("anio") is not None
+
+
+def parsear_fecha(texto: str, referencia=None):
+    """
+    Interpreta un texto que es solo una fecha (admite "el" delante).
+    Retorna datetime o None si la gramática no lo reconoce.
+    """
+    resultado = _parsear(texto, referencia)
+    return resultado[0] if resultado else None
+
+
+def parsear_rango(texto: str, referencia=None):
+    """
+    "del X al Y" / "desde X hasta Y" -> (datetime inicio, datetime fin).
+    Si solo una de las dos fechas trae año, la otra lo toma de ella.
+    Retorna None si alguna de las dos fechas no se reconoce.
+    """
+    m = RANGO.search(texto or "")
+    if not m:
+        return None
+    inicio = _parsear(m.group("inicio"), referencia)
+    fin = _parsear(m.group("fin"), referencia)
+    if not inicio or not fin:
+        return None
+    (f_inicio, inicio_con_anio), (f_fin, fin_con_anio) = inicio, fin
+    try:
+        if fin_con_anio and not inicio_con_anio:
+            f_inicio = f_inicio.replace(year=f_fin.year)
+            if f_inicio > f_fin:
+                f_inicio = f_inicio.replace(year=f_fin.year - 1)
+        elif inicio_con_anio and not fin_con_anio:
+            f_fin = f_fin.replace(year=f_inicio.year)
+            if f_fin < f_inicio:
+                f_fin = f_fin.replace(year=f_inicio.year + 1)
+    except ValueError:
+        # 29 de febrero en un año no bisiesto
+        return None
+    return f_inicio, f_fin
+
+
+def formatear_fecha_larga(fecha) -> str:
+    """
+    datetime/date -> "01 de enero de 2026" (mismo formato que
+    strftime("%d de %B de %Y") con locale es_ES), sin tocar locale:
+    setlocale es global al proceso y no es seguro entre hilos.
+    Retorna "" si no hay fecha.
+    """
+    if not fecha:
+        return ""
+    return f"{fecha.day:02d} de {NOMBRES_MES[fecha.month]} de {fecha.year}"
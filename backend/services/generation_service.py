@@ -1,66 +1,128 @@
 import os
+import copy
+import json
+import time
+import hashlib
+import threading
 import jinja2
+from collections import OrderedDict
+from datetime import datetime
 from models import Chat, TipoContrato, Firmante, Contrato, TipoDocumento, Rol
 from database import db
 from data.contracts_data import CONTRACTS, CLAUSULAS_MAPEADAS
-from services.data_processors import PROCESSOR_REGISTRY
+from services.data_processors import PROCESSOR_REGISTRY, procesar_campos
 
-from services.nlp_utils import get_nlp
-nlp = get_nlp()
+from services.nlp_utils import procesar_lote
+from services.clause_matcher import get_indice_clausulas, get_matriz_clausulas
+from services.pdf_service import marcar_pdf_pendiente, marcar_pdf_error, encolar_pdf_contrato
+from services.document_store import guardar_bytes, registrar_evidencia
 
 # --- Configuración de Jinja2 ---
+# Bytecode compilado de las plantillas, compartido entre workers y reinicios
+# ("" lo desactiva). En producción JINJA_AUTO_RELOAD=false evita el stat
+# del archivo en cada get_template.
+JINJA_BYTECODE_CACHE_DIR = os.getenv(
+    "JINJA_BYTECODE_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "jinja")
+)
+JINJA_AUTO_RELOAD = os.getenv("JINJA_AUTO_RELOAD", "true").lower() in ("1", "true", "si", "sí")
+
+def _bytecode_cache():
+    if not JINJA_BYTECODE_CACHE_DIR:
+        return None
+    try:
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        return jinja2.FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+    except OSError as e:
+        print(f"⚠️ Caché de bytecode Jinja2 desactivada: {e}")
+        return None
+
 try:
     script_dir = os.path.dirname(__file__)
     template_path = os.path.join(script_dir, '..', 'templates')
     jinja_env = jinja2.Environment(
         loader=jinja2.FileSystemLoader(template_path),
-        autoescape=jinja2.select_autoescape(['html', 'xml'])
+        autoescape=jinja2.select_autoescape(['html', 'xml']),
+        bytecode_cache=_bytecode_cache(),
+        auto_reload=JINJA_AUTO_RELOAD
     )
 except Exception as e:
     print(f"Error cargando el entorno Jinja2: {e}")
     jinja_env = None
 
+def precompilar_plantillas():
+    """
+    Compila al arranque la plantilla de cada contrato de CONTRACTS, para
+    que la primera vista previa no pague la compilación. Retorna la lista
+    de plantillas que no se encontraron.
+    """
+    if not jinja_env:
+        return []
+    inicio = time.perf_counter()
+    faltantes = []
+    for alias in sorted({info["plantilla_alias"] for info in CONTRACTS.values()}):
+        try:
+            jinja_env.get_template(f"{alias}.html")
+        except jinja2.exceptions.TemplateNotFound:
+            faltantes.append(alias)
+    print(f"Plantillas Jinja2 precompiladas en {time.perf_counter() - inicio:.2f}s.")
+    if faltantes:
+        print(f"⚠️ Plantillas no encontradas: {', '.join(faltantes)}")
+    return faltantes
+
+def _clausula_adhoc(raw_text):
+    return {
+        "titulo": "Cláusula Adicional (A solicitud)",
+        "texto": raw_text,
+        "origen_usuario": raw_text
+    }
+
 def _procesar_clausulas_especiales(lista_clausulas_raw):
     """
     Toma la lista de cláusulas en lenguaje natural del usuario y
     las mapea a cláusulas formales o las incluye como "ad-hoc".
+    Devuelve (clausulas, procesadas); procesadas es False si no hubo
+    modelo NLP y el resultado no debe reutilizarse en la próxima carga.
     """
+    if not lista_clausulas_raw:
+        return [], True
+
     clausulas_formales = []
-    if not nlp:
+    indice = get_indice_clausulas()
+    if not indice:
         print("spaCy no está cargado. Omitiendo categorización de cláusulas.")
-        return []
+        return [], False
 
-    doc_clausulas = [nlp(c.lower()) for c in lista_clausulas_raw]
+    # Una sola pasada de nlp.pipe para todas las cláusulas
+    doc_clausulas = procesar_lote(c.lower() for c in lista_clausulas_raw)
+    if doc_clausulas is None:
+        # El servicio NLP se cayó después de construir el índice
+        print("Servicio NLP no disponible. Cláusulas incluidas como ad-hoc.")
+        return [_clausula_adhoc(raw_text) for raw_text in lista_clausulas_raw], False
+
+    # 1. Mapeo semántico: todas las cláusulas contra todo el catálogo a la vez
+    matriz = get_matriz_clausulas()
+    mapeo_semantico = matriz.mapear(doc_clausulas) if matriz else [(None, 0.0)] * len(doc_clausulas)
 
     for i, doc in enumerate(doc_clausulas):
         raw_text = lista_clausulas_raw[i]
-        found = False
-        
-        # 1. Intentar mapear a una cláusula estándar
-        for key, data in CLAUSULAS_MAPEADAS.items():
-            # Usar lemas (forma base de la palabra) para mejor coincidencia
-            lemmas_doc = {token.lemma_ for token in doc}
-            lemmas_keywords = {nlp(k)[0].lemma_ for k in data["keywords"]}
-            
-            # Si hay una intersección de palabras clave
-            if lemmas_doc.intersection(lemmas_keywords):
-                clausulas_formales.append({
-                    "titulo": data["titulo"],
-                    "texto": data["texto"],
-                    "origen_usuario": raw_text # Guardamos lo que dijo el usuario
-                })
-                found = True
-                break
-        
-        # 2. Si no se mapea, agregar como cláusula "ad-hoc"
-        if not found:
+
+        # 2. Si no supera el umbral, intentar por palabras clave
+        # Usar lemas (forma base de la palabra) para mejor coincidencia
+        key = mapeo_semantico[i][0] or indice.buscar(token.lemma_ for token in doc)
+        if key:
+            data = CLAUSULAS_MAPEADAS[key]
             clausulas_formales.append({
-                "titulo": "Cláusula Adicional (A solicitud)",
-                "texto": raw_text,
-                "origen_usuario": raw_text
+                "titulo": data["titulo"],
+                "texto": data["texto"],
+                "origen_usuario": raw_text # Guardamos lo que dijo el usuario
             })
+
+        # 3. Si no se mapea, agregar como cláusula "ad-hoc"
+        else:
+            clausulas_formales.append(_clausula_adhoc(raw_text))
             
-    return clausulas_formales
+    return clausulas_formales, True
 
 def generar_documento_final(chat_id):
     """
@@ -70,6 +132,21 @@ def generar_documento_final(chat_id):
     3. CAMBIA el estado del chat a "esperando_aprobacion_formal".
     4. Renderiza la plantilla Jinja2 para la vista previa.
     """
+    html_final, _ = generar_vista_previa(chat_id)
+    return html_final
+
+
+def generar_vista_previa(chat_id, if_none_match=None, streaming=False):
+    """
+    Igual que generar_documento_final, pero devuelve (html, etag). El ETag
+    es el hash del contexto limpio más la versión de la plantilla; si está
+    en if_none_match (lo que envió el cliente) no se renderiza y el html
+    es None. Los HTML renderizados se guardan en una caché LRU por ETag.
+
+    Con streaming=True, si el HTML no está en caché se devuelve un
+    generador de fragmentos (template.stream con buffer) en lugar del
+    string completo, para enviar los primeros bytes sin esperar al final.
+    """
     if not jinja_env:
         raise RuntimeError("El entorno de plantillas Jinja2 no está inicializado.")
 
@@ -91,49 +168,174 @@ def generar_documento_final(chat_id):
         raise ValueError(f"El chat no está en estado 'generando_contrato', sino en '{metadata.get('estado')}'")
 
     # --- 3. Renderizar Plantilla Jinja2 (Vista Previa) ---
-    print("🧩 Contexto renta:", contexto_jinja.get("renta"))
-
     try:
         template_name = f"{plantilla_alias}.html"
         template = jinja_env.get_template(template_name)
-        html_final = template.render(**contexto_jinja)
-        return html_final
-
     except jinja2.exceptions.TemplateNotFound:
         raise FileNotFoundError(f"No se encontró la plantilla: {template_name}")
+
+    etag = _etag_vista_previa(contexto_jinja, template)
+    if if_none_match is not None and etag in if_none_match:
+        return None, etag
+
+    html_final = _cache_vista_previa.get(etag)
+    if html_final is None and streaming:
+        return _renderizar_en_stream(template, contexto_jinja, etag), etag
+    if html_final is None:
+        print("🧩 Contexto renta:", contexto_jinja.get("renta"))
+        try:
+            html_final = template.render(**contexto_jinja)
+        except Exception as e:
+            raise RuntimeError(f"Error al renderizar la plantilla Jinja2: {str(e)}")
+        _cache_vista_previa.put(etag, html_final)
+    return html_final, etag
+
+
+def _renderizar_html(plantilla_alias, contexto_jinja):
+    """HTML completo de un contexto ya procesado (usa la caché de vistas previas)."""
+    template = jinja_env.get_template(f"{plantilla_alias}.html")
+    etag = _etag_vista_previa(contexto_jinja, template)
+    html_final = _cache_vista_previa.get(etag)
+    if html_final is None:
+        html_final = template.render(**contexto_jinja)
+        _cache_vista_previa.put(etag, html_final)
+    return html_final
+
+
+def _renderizar_en_stream(template, contexto_jinja, etag):
+    """Genera el HTML por fragmentos y al terminar lo guarda en la caché."""
+    partes = []
+    stream = template.stream(**contexto_jinja)
+    stream.enable_buffering(VISTA_PREVIA_BUFFER)
+    try:
+        for fragmento in stream:
+            partes.append(fragmento)
+            yield fragmento
     except Exception as e:
-        raise RuntimeError(f"Error al renderizar la plantilla Jinja2: {str(e)}")
+        # Los encabezados ya se enviaron: solo queda registrar y cortar
+        print(f"Error al renderizar la plantilla Jinja2 en streaming: {e}")
+        raise
+    _cache_vista_previa.put(etag, "".join(partes))
+
+
+def _version_plantilla(template):
+    """Nombre y fecha de modificación del archivo de la plantilla."""
+    try:
+        return f"{template.name}:{os.path.getmtime(template.filename)}"
+    except (TypeError, OSError):
+        return template.name or ""
+
+
+def _etag_vista_previa(contexto_jinja, template):
+    contenido = json.dumps(contexto_jinja, ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha256()
+    digest.update(_version_plantilla(template).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(contenido.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _CacheVistaPrevia:
+    """LRU acotada de HTML renderizado, compartida por los hilos del worker."""
+
+    def __init__(self, max_entradas):
+        self._max = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            html = self._datos.get(clave)
+            if html is not None:
+                self._datos.move_to_end(clave)
+            return html
+
+    def put(self, clave, html):
+        if self._max <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = html
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self._max:
+                self._datos.popitem(last=False)
+
+
+# Eventos de plantilla que Jinja agrupa antes de entregar cada fragmento
+VISTA_PREVIA_BUFFER = int(os.getenv("VISTA_PREVIA_BUFFER", "40"))
+
+_cache_vista_previa = _CacheVistaPrevia(int(os.getenv("VISTA_PREVIA_CACHE_MAX", "64")))
+
+
+def _huella(tipo_dato, raw_value):
+    """
+    Huella del dato crudo de un campo. Incluye la versión del procesador
+    (un cambio de versión reprocesa los chats ya guardados) y, para
+    procesadores con TTL (fechas relativas a hoy), el periodo vigente, así
+    se recalculan al vencer.
+    """
+    contenido = json.dumps([tipo_dato, raw_value], ensure_ascii=False, sort_keys=True, default=str)
+    procesador = PROCESSOR_REGISTRY.metadatos(tipo_dato)
+    if procesador:
+        contenido += f"|v{procesador.version}"
+    if procesador and procesador.ttl:
+        contenido += f"|{int(time.time() // procesador.ttl)}"
+    return hashlib.sha1(contenido.encode("utf-8")).hexdigest()
 
 
 def procesar_datos_crudos(metadata, chat, actualizar_estado=True):
+    """
+    Construye el contexto de la plantilla de forma incremental: junto a
+    contexto_limpio se guarda en metadatos["huellas_contexto"] la huella
+    del dato crudo de cada campo, y solo se reprocesan los campos cuya
+    huella cambió. Si el contexto resultante es el mismo, no se escribe
+    en la BBDD.
+    """
     tipo_contrato = metadata["tipo_contrato"]
     respuestas_raw = metadata["respuestas"]
     clausulas_raw = metadata.get("clausulas_especiales", [])
     contrato_info = CONTRACTS[tipo_contrato]
 
+    contexto_previo = metadata.get("contexto_limpio") or {}
+    huellas_previas = metadata.get("huellas_contexto") or {}
+    huellas = {}
+
     # --- 2. Procesar Datos Crudos (Build Context) ---
+    # Los campos sin cambios se toman del contexto guardado; el resto corre
+    # en paralelo, con tiempo límite por campo
     contexto_jinja = {}
+    campos = []
     for pregunta_info in contrato_info["preguntas"]:
         key = pregunta_info["key"]
         tipo_dato = pregunta_info["tipo_dato"]
         raw_value = respuestas_raw.get(key)
-        
+
         if not raw_value:
             continue
 
-        processor_func = PROCESSOR_REGISTRY.get(tipo_dato)
-        
-        if processor_func:
-            try:
-                contexto_jinja[key] = processor_func(raw_value)
-            except Exception as e:
-                print(f"Error procesando {key}: {e}")
-                contexto_jinja[key] = {"error": str(e)}
+        huellas[key] = _huella(tipo_dato, raw_value)
+        if huellas_previas.get(key) == huellas[key] and key in contexto_previo:
+            contexto_jinja[key] = copy.deepcopy(contexto_previo[key])
         else:
-            contexto_jinja[key] = raw_value
+            contexto_jinja[key] = None  # reserva el orden de las preguntas
+            campos.append((key, tipo_dato, raw_value))
+
+    if campos:
+        procesados, degradados = procesar_campos(campos)
+        contexto_jinja.update(procesados)
+        # Un valor degradado (timeout/error) se reintenta en la próxima carga
+        for key in degradados:
+            huellas.pop(key, None)
 
     # --- 3. Procesar Cláusulas Especiales ---
-    contexto_jinja["clausulas_adicionales"] = _procesar_clausulas_especiales(clausulas_raw)
+    huellas["clausulas_adicionales"] = _huella("clausulas_adicionales", clausulas_raw)
+    if (huellas_previas.get("clausulas_adicionales") == huellas["clausulas_adicionales"]
+            and "clausulas_adicionales" in contexto_previo):
+        contexto_jinja["clausulas_adicionales"] = copy.deepcopy(contexto_previo["clausulas_adicionales"])
+    else:
+        contexto_jinja["clausulas_adicionales"], procesadas = _procesar_clausulas_especiales(clausulas_raw)
+        # Sin modelo NLP el resultado es provisional: se reintenta en la próxima carga
+        if not procesadas:
+            huellas.pop("clausulas_adicionales")
 
     # --- 4. Añadir Metadatos Finales ---
     contexto_jinja["titulo_contrato"] = contrato_info["nombre"]
@@ -150,13 +352,15 @@ def procesar_datos_crudos(metadata, chat, actualizar_estado=True):
     if actualizar_estado:
         try:
             chat.metadatos["contexto_limpio"] = contexto_jinja
+            chat.metadatos["huellas_contexto"] = huellas
             chat.metadatos["estado"] = "esperando_aprobacion_formal"
             db.session.commit()
         except Exception as e:
             db.session.rollback()
             raise RuntimeError(f"Error al actualizar estado del chat: {str(e)}")
-    else:
+    elif contexto_jinja != contexto_previo or huellas != huellas_previas:
         chat.metadatos["contexto_limpio"] = contexto_jinja
+        chat.metadatos["huellas_contexto"] = huellas
         db.session.commit()
 
     return contexto_jinja, plantilla_alias
@@ -166,19 +370,37 @@ def procesar_datos_crudos(metadata, chat, actualizar_estado=True):
 
 # --- FUNCIÓN 2: FORMALIZAR CONTRATO (NUEVA) ---
 
+# Rol de los firmantes que no salen de una pregunta con "rol_firmante"
+ROL_FIRMANTE = "firmante"
+
+def _get_rol(nombre):
+    """Busca el Rol por nombre y lo crea si falta."""
+    rol_db = db.session.query(Rol).filter_by(nombre=nombre).first()
+    if not rol_db:
+        print(f"Creando Rol faltante: {nombre}")
+        rol_db = Rol(nombre=nombre)
+        db.session.add(rol_db)
+        db.session.flush() # Para obtener el ID
+    return rol_db
+
 def _generar_codigo_contrato():
     """Genera un código único para el contrato."""
     now = datetime.utcnow()
     count = Contrato.query.filter(db.func.DATE(Contrato.fecha_creacion) == now.date()).count() + 1
     return f"CONT-{now.year}-{now.month:02d}-{now.day:02d}-{count:04d}"
 
-def formalizar_contrato(chat_id):
+def formalizar_contrato(chat_id, firmantes_extra=None):
     """
     Función de formalización (Escritura en BBDD).
     1. Lee el "contexto_limpio" guardado en el chat.
     2. Crea el registro "Contrato" en la BBDD.
     3. Crea los registros "Firmante" asociados.
     4. Devuelve el código del nuevo contrato.
+
+    firmantes_extra: los firmantes confirmados en el formulario del chat,
+    [{"role": key de la pregunta (opcional), "nombre", "dni", "correo",
+    "telefono"}]. Completan el correo y teléfono del firmante de la misma
+    pregunta; los demás se agregan con el rol "firmante".
     """
     chat = Chat.query.get(chat_id)
     if not chat or chat.metadatos.get("estado") != "esperando_aprobacion_formal":
@@ -222,18 +444,21 @@ def formalizar_contrato(chat_id):
         if not tipo_doc_dni:
             print("Advertencia: TipoDocumento 'DNI' no encontrado en la BBDD.")
 
+        # Firmantes del formulario, por la pregunta de la que salieron
+        extras_por_key = {}
+        extras_sin_key = []
+        for extra in firmantes_extra or []:
+            if not isinstance(extra, dict) or not (extra.get("nombre") or "").strip():
+                continue
+            if extra.get("role"):
+                extras_por_key[extra["role"]] = extra
+            else:
+                extras_sin_key.append(extra)
+
         for pregunta in contrato_info["preguntas"]:
             if pregunta.get("es_firmante"):
                 key = pregunta["key"]
-                rol_nombre = pregunta["rol_firmante"]
-                
-                # Buscar el Rol en la BBDD
-                rol_db = db.session.query(Rol).filter_by(nombre=rol_nombre).first()
-                if not rol_db:
-                    print(f"Creando Rol faltante: {rol_nombre}")
-                    rol_db = Rol(nombre=rol_nombre)
-                    db.session.add(rol_db)
-                    db.session.flush() # Para obtener el ID
+                rol_db = _get_rol(pregunta["rol_firmante"])
                 
                 # Obtener datos del firmante del JSON limpio
                 firmante_data = contexto_limpio.get(key)
@@ -244,31 +469,58 @@ def formalizar_contrato(chat_id):
                 # Extraer datos según el tipo_dato
                 nombre_firmante = firmante_data.get("nombre_completo") or firmante_data.get("nombre_razon_social")
                 doc_firmante = firmante_data.get("dni") or firmante_data.get("documento_numero")
-                
-                # NOTA: Tu chat no pide email/teléfono. Son NULL aquí.
-                # Deberías añadir pasos al chat para pedir email/teléfono antes de formalizar.
+                extra = extras_por_key.pop(key, {})
                 
                 nuevo_firmante = Firmante(
                     contrato_id = nuevo_contrato.id,
                     nombre = nombre_firmante,
-                    numero_documento = doc_firmante,
+                    correo = extra.get("correo") or None,
+                    telefono = extra.get("telefono") or None,
                     tipo_documento_id = tipo_doc_dni.id if tipo_doc_dni else None,
                     rol_firmante_id = rol_db.id,
-                    estado = "INVITADO"
-                    # correo y telefono quedan null
+                    estado = "INVITADO",
+                    metadatos = {"parte": key, "numero_documento": doc_firmante}
                 )
                 db.session.add(nuevo_firmante)
 
+        # Firmantes del formulario sin pregunta "es_firmante" en CONTRACTS
+        # (hoy, todos) o agregados a mano en el formulario
+        for key, extra in list(extras_por_key.items()) + [(None, e) for e in extras_sin_key]:
+            db.session.add(Firmante(
+                contrato_id = nuevo_contrato.id,
+                nombre = extra["nombre"].strip(),
+                correo = extra.get("correo") or None,
+                telefono = extra.get("telefono") or None,
+                tipo_documento_id = tipo_doc_dni.id if tipo_doc_dni and extra.get("dni") else None,
+                rol_firmante_id = _get_rol(ROL_FIRMANTE).id,
+                estado = "INVITADO",
+                metadatos = {"parte": key, "numero_documento": extra.get("dni") or None}
+            ))
+
         # 4. Confirmar la transacción
         chat.metadatos["estado"] = "formalizado" # Estado final del chat
         chat.metadatos["contrato_id_generado"] = nuevo_contrato.id
+        marcar_pdf_pendiente(nuevo_contrato)
         db.session.commit()
-        
-        return nuevo_contrato.codigo
 
     except Exception as e:
         db.session.rollback()
         # Revertir estado del chat si la formalización falla
         chat.metadatos["estado"] = "esperando_aprobacion_formal"
         db.session.commit()
-        raise RuntimeError(f"Error al formalizar el contrato: {str(e)}")
\ No newline at end of file
+        raise RuntimeError(f"Error al formalizar el contrato: {str(e)}")
+
+    # 5. HTML final al almacén por contenido (con su evidencia SHA-256) y
+    #    PDF en segundo plano (proceso aparte), ya con el contrato guardado
+    try:
+        html_final = _renderizar_html(tipo_contrato_alias, contexto_limpio)
+        registrar_evidencia(nuevo_contrato.id, guardar_bytes(html_final, ".html"), "html")
+        db.session.commit()
+        encolar_pdf_contrato(nuevo_contrato, html_final)
+    except Exception as e:
+        print(f"⚠️ No se pudo encolar el PDF del contrato {nuevo_contrato.codigo}: {e}")
+        db.session.rollback()
+        marcar_pdf_error(nuevo_contrato, e)
+        db.session.commit()
+
+    return nuevo_contrato.codigo
\ No newline at end of file
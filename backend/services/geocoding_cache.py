@@ -0,0 +1,99 @@
+# services/geocoding_cache.py
+"""
+Caché persistente de geocodificación (Nominatim).
+
+Se guarda en un archivo SQLite local, compartido por todos los workers de
+la máquina, con la dirección normalizada de limpiar_direccion como clave.
+Las direcciones que Nominatim no encuentra también se guardan (caché
+negativa) con un TTL más corto, para no volver a consultarlas en cada
+vista previa.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+CACHE_PATH = os.getenv(
+    "GEOCODING_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "geocoding.sqlite3")
+)
+CACHE_TTL_S = int(os.getenv("GEOCODING_CACHE_TTL_S", str(30 * 24 * 3600)))
+CACHE_TTL_NEGATIVO_S = int(os.getenv("GEOCODING_CACHE_TTL_NEGATIVO_S", str(24 * 3600)))
+
+
+def normalizar_clave(direccion: str) -> str:
+    return " ".join(direccion.lower().split())
+
+
+class CacheGeocodificacion:
+    def __init__(self, ruta: str = CACHE_PATH, ttl: int = CACHE_TTL_S, ttl_negativo: int = CACHE_TTL_NEGATIVO_S):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {"hits": 0, "hits_negativos": 0, "misses": 0, "expirados": 0, "escrituras": 0}
+
+    def _conexion(self):
+        if self._conn is None:
+            if self.ruta != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+            conn = sqlite3.connect(self.ruta, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocodificacion ("
+                " clave TEXT PRIMARY KEY,"
+                " resultado TEXT,"
+                " expira REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def obtener(self, direccion: str):
+        """
+        Devuelve (encontrado, resultado). resultado es None cuando la
+        dirección está en la caché negativa.
+        """
+        clave = normalizar_clave(direccion)
+        with self._lock:
+            fila = self._conexion().execute(
+                "SELECT resultado, expira FROM geocodificacion WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                self._stats["misses"] += 1
+                return False, None
+            resultado, expira = fila
+            if expira < time.time():
+                self._stats["expirados"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            if resultado is None:
+                self._stats["hits_negativos"] += 1
+                return True, None
+            self._stats["hits"] += 1
+            return True, json.loads(resultado)
+
+    def guardar(self, direccion: str, resultado):
+        """Guarda el resultado; None registra la dirección como no encontrada."""
+        ttl = self.ttl if resultado is not None else self.ttl_negativo
+        with self._lock:
+            conn = self._conexion()
+            conn.execute(
+                "INSERT OR REPLACE INTO geocodificacion (clave, resultado, expira) VALUES (?, ?, ?)",
+                (
+                    normalizar_clave(direccion),
+                    json.dumps(resultado, ensure_ascii=False) if resultado is not None else None,
+                    time.time() + ttl,
+                )
+            )
+            conn.commit()
+            self._stats["escrituras"] += 1
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+# Instancia compartida por el proceso
+geocoding_cache = CacheGeocodificacion()
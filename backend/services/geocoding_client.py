@@ -0,0 +1,217 @@
+# services/geocoding_client.py
+"""
+Cliente HTTP compartido para geocodificación (Nominatim).
+
+- Una sesión requests con pool de conexiones (keep-alive).
+- Limitador token-bucket: la política de Nominatim es máximo 1 petición
+  por segundo por aplicación. El limitador vive en cada proceso, así que
+  con N workers web la aplicación haría N peticiones por segundo:
+  GEOCODING_PROCESOS indica cuántos procesos comparten el límite y cada
+  uno usa GEOCODING_RATE_POR_SEGUNDO / GEOCODING_PROCESOS.
+- Agrupación de peticiones idénticas en vuelo: si varios hilos piden la
+  misma dirección a la vez, solo uno va a la red y el resto espera su
+  resultado.
+- Circuit breaker: tras varios fallos seguidos se deja de llamar a la API
+  durante un tiempo y se falla de inmediato (el llamador usa el fallback
+  local) en lugar de esperar el timeout en cada vista previa.
+
+La URL base es configurable (NOMINATIM_URL) para probar contra un
+servidor HTTP local.
+"""
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+USER_AGENT = "ChatNotarial/1.0"
+
+# (conexión, lectura) en segundos
+TIMEOUT = (
+    float(os.getenv("GEOCODING_TIMEOUT_CONEXION_S", "3")),
+    float(os.getenv("GEOCODING_TIMEOUT_LECTURA_S", "5")),
+)
+# Límite de toda la aplicación, repartido entre los procesos que lo comparten
+RATE_POR_SEGUNDO = float(os.getenv("GEOCODING_RATE_POR_SEGUNDO", "1"))
+PROCESOS = max(1, int(os.getenv("GEOCODING_PROCESOS", "1")))
+ESPERA_MAX_TOKEN_S = float(os.getenv("GEOCODING_ESPERA_MAX_TOKEN_S", "2"))
+FALLOS_PARA_ABRIR = int(os.getenv("GEOCODING_FALLOS_PARA_ABRIR", "3"))
+ENFRIAMIENTO_S = float(os.getenv("GEOCODING_ENFRIAMIENTO_S", "60"))
+
+
+class GeocodingNoDisponible(Exception):
+    """La API no se consultó (circuito abierto o límite de peticiones)."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacidad: float = 1):
+        self.rate = rate
+        self.capacidad = capacidad
+        self._tokens = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, espera_max: float) -> bool:
+        """Toma un token, esperando como mucho espera_max segundos."""
+        limite = time.monotonic() + espera_max
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.rate)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                espera = (1 - self._tokens) / self.rate
+            if ahora + espera > limite:
+                return False
+            time.sleep(espera)
+
+
+class CircuitBreaker:
+    """cerrado -> abierto (tras N fallos) -> semiabierto (una prueba) -> cerrado."""
+
+    def __init__(self, fallos_para_abrir: int, enfriamiento_s: float):
+        self.fallos_para_abrir = fallos_para_abrir
+        self.enfriamiento_s = enfriamiento_s
+        self.estado = "cerrado"
+        self._fallos = 0
+        self._abierto_desde = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.estado == "abierto":
+                if time.monotonic() - self._abierto_desde < self.enfriamiento_s:
+                    return False
+                self.estado = "semiabierto"
+                return True
+            # En semiabierto solo pasa la petición de prueba
+            return self.estado == "cerrado"
+
+    def registrar_exito(self):
+        with self._lock:
+            self.estado = "cerrado"
+            self._fallos = 0
+
+    def cancelar_prueba(self):
+        """
+        La petición de prueba no llegó a hacerse (p. ej. sin token del
+        limitador): vuelve a abierto sin reiniciar el enfriamiento, así la
+        próxima llamada puede volver a intentar la prueba.
+        """
+        with self._lock:
+            if self.estado == "semiabierto":
+                self.estado = "abierto"
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self.estado == "semiabierto" or self._fallos >= self.fallos_para_abrir:
+                if self.estado != "abierto":
+                    print(f"⚠️ Geocodificación: circuito abierto por {self.enfriamiento_s:.0f}s tras {self._fallos} fallos.")
+                self.estado = "abierto"
+                self._abierto_desde = time.monotonic()
+
+
+class _EnVuelo:
+    __slots__ = ("listo", "resultado", "error")
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class ClienteGeocodificacion:
+    def __init__(self, url: str = NOMINATIM_URL, rate: float = RATE_POR_SEGUNDO / PROCESOS,
+                 fallos_para_abrir: int = FALLOS_PARA_ABRIR, enfriamiento_s: float = ENFRIAMIENTO_S):
+        self.url = url
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limitador = TokenBucket(rate)
+        self.circuito = CircuitBreaker(fallos_para_abrir, enfriamiento_s)
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self._stats = {"peticiones": 0, "agrupadas": 0, "rechazadas": 0, "errores": 0}
+
+    def buscar(self, texto_busqueda: str):
+        """
+        Devuelve el bloque "address" del primer resultado o None si la
+        dirección no existe. Lanza GeocodingNoDisponible si no se consultó
+        la API, o la excepción de red/HTTP correspondiente.
+        """
+        with self._lock:
+            vuelo = self._en_vuelo.get(texto_busqueda)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_vuelo[texto_busqueda] = _EnVuelo()
+            else:
+                self._stats["agrupadas"] += 1
+
+        if not lider:
+            vuelo.listo.wait()
+            if vuelo.error:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = self._consultar(texto_busqueda)
+        except Exception as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(texto_busqueda, None)
+            vuelo.listo.set()
+        return vuelo.resultado
+
+    def _consultar(self, texto_busqueda: str):
+        if not self.circuito.permitir():
+            self._contar("rechazadas")
+            raise GeocodingNoDisponible("Circuito abierto: Nominatim no disponible")
+        if not self.limitador.adquirir(ESPERA_MAX_TOKEN_S):
+            self.circuito.cancelar_prueba()
+            self._contar("rechazadas")
+            raise GeocodingNoDisponible("Límite de peticiones a Nominatim alcanzado")
+
+        self._contar("peticiones")
+        try:
+            resp = self.session.get(
+                self.url,
+                params={"q": texto_busqueda, "format": "json", "addressdetails": 1},
+                timeout=TIMEOUT,
+            )
+            resp.raise_for_status()
+            resultados = resp.json()
+        except Exception:
+            self._contar("errores")
+            self.circuito.registrar_fallo()
+            raise
+        self.circuito.registrar_exito()
+        return resultados[0]["address"] if resultados else None
+
+    def _contar(self, clave):
+        with self._lock:
+            self._stats[clave] += 1
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return dict(self._stats, circuito=self.circuito.estado)
+
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+def get_cliente_geocodificacion():
+    """Cliente compartido por todos los hilos del proceso."""
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = ClienteGeocodificacion()
+    return _cliente
@@ -0,0 +1,245 @@
+# services/montos.py
+"""
+Montos en letras para documentos legales ("Cuatrocientos y 50/100 soles").
+
+Conversión de números a palabras en español por tablas, sin num2words,
+con caché LRU: los mismos montos (rentas, garantías, plazos) se repiten
+en cada vista previa del contrato.
+
+También el tokenizador de montos que usan todos los procesadores de
+montos: una sola pasada sobre la respuesta produce (valor, moneda, rol).
+"""
+import re
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from functools import lru_cache
+
+CACHE_MAX = 2048
+
+_UNIDADES = (
+    "cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve",
+    "diez", "once", "doce", "trece", "catorce", "quince", "dieciséis", "diecisiete",
+    "dieciocho", "diecinueve", "veinte", "veintiuno", "veintidós", "veintitrés",
+    "veinticuatro", "veinticinco", "veintiséis", "veintisiete", "veintiocho", "veintinueve",
+)
+_DECENAS = ("", "", "", "treinta", "cuarenta", "cincuenta", "sesenta", "setenta", "ochenta", "noventa")
+_CENTENAS = (
+    "", "ciento", "doscientos", "trescientos", "cuatrocientos", "quinientos",
+    "seiscientos", "setecientos", "ochocientos", "novecientos",
+)
+
+# Nombre en el texto del monto y símbolo en la plantilla
+MONEDAS = {
+    "soles": ("soles", "S/"),
+    "dólares": ("dólares", "US$"),
+}
+_ALIAS_MONEDA = {
+    "s/": "soles", "s/.": "soles", "pen": "soles", "sol": "soles", "soles": "soles",
+    "us$": "dólares", "$": "dólares", "usd": "dólares", "dolares": "dólares",
+    "dólares": "dólares", "dolar": "dólares", "dólar": "dólares",
+}
+
+_MAXIMO = 10 ** 18  # hasta novecientos noventa y nueve mil... billones
+
+
+def _apocopar(palabras: str) -> str:
+    """'uno' -> 'un' delante de mil, millón o billón ("ciento veintiún mil")."""
+    if palabras == "uno":
+        return "un"
+    if palabras.endswith("veintiuno"):
+        return palabras[:-len("veintiuno")] + "veintiún"
+    if palabras.endswith(" uno"):
+        return palabras[:-3] + "un"
+    return palabras
+
+
+def _menor_mil(n: int) -> str:
+    centenas, resto = divmod(n, 100)
+    partes = []
+    if centenas:
+        partes.append("cien" if n == 100 else _CENTENAS[centenas])
+    if resto:
+        if resto < 30:
+            partes.append(_UNIDADES[resto])
+        else:
+            decenas, unidades = divmod(resto, 10)
+            partes.append(_DECENAS[decenas] + (f" y {_UNIDADES[unidades]}" if unidades else ""))
+    return " ".join(partes)
+
+
+def _menor_millon(n: int) -> str:
+    miles, resto = divmod(n, 1000)
+    partes = []
+    if miles:
+        partes.append("mil" if miles == 1 else f"{_apocopar(_menor_mil(miles))} mil")
+    if resto:
+        partes.append(_menor_mil(resto))
+    return " ".join(partes)
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def numero_a_letras(n: int) -> str:
+    """
+    Entero no negativo en palabras, en minúsculas: 1500 -> "mil quinientos".
+    Números fuera de rango se devuelven en cifras.
+
+        >>> numero_a_letras(21000)
+        'veintiún mil'
+        >>> numero_a_letras(121000)
+        'ciento veintiún mil'
+        >>> numero_a_letras(221000000)
+        'doscientos veintiún millones'
+        >>> numero_a_letras(31000)
+        'treinta y un mil'
+    """
+    n = int(n)
+    if n < 0 or n >= _MAXIMO:
+        return str(n)
+    if n == 0:
+        return "cero"
+
+    billones, resto = divmod(n, 10 ** 12)
+    millones, resto = divmod(resto, 10 ** 6)
+    partes = []
+    if billones:
+        partes.append("un billón" if billones == 1 else f"{_apocopar(_menor_millon(billones))} billones")
+    if millones:
+        partes.append("un millón" if millones == 1 else f"{_apocopar(_menor_millon(millones))} millones")
+    if resto:
+        partes.append(_menor_millon(resto))
+    return " ".join(partes)
+
+
+def normalizar_moneda(moneda: str) -> str:
+    """'S/', 'PEN', 'USD', 'US$', 'dolares'... -> 'soles' o 'dólares' (soles por defecto)."""
+    return _ALIAS_MONEDA.get((moneda or "").strip().lower(), "soles")
+
+
+def simbolo_moneda(moneda: str) -> str:
+    return MONEDAS[normalizar_moneda(moneda)][1]
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def _monto_en_letras(monto: Decimal, moneda: str) -> str:
+    entero = int(monto)
+    centimos = int((monto - entero) * 100)
+    return f"{numero_a_letras(entero).capitalize()} y {centimos:02d}/100 {MONEDAS[moneda][0]}"
+
+
+def monto_en_letras(monto, moneda: str = "soles") -> str:
+    """
+    Monto en formato legal con céntimos reales:
+        1500.5, "soles"  -> "Mil quinientos y 50/100 soles"
+        21000, "US$"     -> "Veintiún mil y 00/100 dólares"
+    """
+    try:
+        valor = Decimal(str(monto or 0)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        valor = Decimal("0.00")
+    return _monto_en_letras(abs(valor), normalizar_moneda(moneda))
+
+
+# ---------------------------------------------------------------------
+# TOKENIZADOR DE MONTOS
+# ---------------------------------------------------------------------
+TokenMonto = namedtuple("TokenMonto", "valor moneda rol")
+
+ROL_RENTA = "renta"
+ROL_GARANTIA = "garantia"
+
+_TOKEN = re.compile(
+    r"""
+    # "s/" solo al inicio de palabra: no el final de "meses/año"
+    (?P<moneda>\bs/\.?|\bus\$|\$|\busd\b|\bpen\b|\bd[oó]lar(?:es)?\b|\bsol(?:es)?\b)
+    # 1.500,50 / 1,500.50 / 12,000 / 10 000: el separador de miles se repite
+    # igual y el decimal (si hay) es el otro
+    | (?P<numero>
+        \d{1,3}(?P<mil>[.,\x20\xa0])\d{3}(?:(?P=mil)\d{3})*(?:(?!(?P=mil))[.,]\d{1,2})?(?!\d)
+        | \d+(?:[.,]\d+)?
+      )
+      (?:\s+(?P<escala>mil(?:l[oó]n|lones)?)\b)?   # "3 mil", "1,5 millones"
+    | (?P<porcentaje>%|\bpor\s+ciento\b)
+    | (?P<tiempo>\b(?:d[ií]as?|semanas?|mes(?:es)?|a[nñ]os?)\b)
+    | (?P<garantia>\bgarant[ií]a|\badelanto|\bdep[oó]sito)
+    | (?P<renta>\brenta|\balquiler|\bmensual(?:es|idad(?:es)?)?\b|\bmerced\s+conductiva)
+    | (?P<separador>[;,]|\.(?!\d)|\by\b)
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def _valor(m) -> float:
+    texto = m.group("numero")
+    mil = m.group("mil")
+    if mil:
+        texto = texto.replace(mil, "")
+    valor = float(texto.replace(",", "."))
+    escala = (m.group("escala") or "").lower()
+    if escala == "mil":
+        valor *= 1_000
+    elif escala:
+        valor *= 1_000_000
+    return round(valor, 2)
+
+
+def _rol(tokens, i):
+    """Pista de rol del número i: la más cercana antes, o si no después, en su tramo."""
+    for paso in (-1, 1):
+        j = i + paso
+        while 0 <= j < len(tokens) and tokens[j][0] not in ("separador", "numero"):
+            if tokens[j][0] in (ROL_RENTA, ROL_GARANTIA):
+                return tokens[j][0]
+            j += paso
+    return None
+
+
+def tokenizar_montos(texto: str):
+    """
+    Recorre la respuesta una sola vez y devuelve (montos, moneda):
+      - montos: [TokenMonto(valor, moneda|None, rol|None)] en orden de aparición;
+        los porcentajes y las duraciones ("2 meses", "30 días") se descartan.
+      - moneda: 'soles' o 'dólares', la primera mencionada (soles por defecto).
+
+        "Se pagan S/ 1.500,50 mensuales y una garantía de 3,000 soles"
+        -> [TokenMonto(1500.5, 'soles', 'renta'), TokenMonto(3000.0, 'soles', 'garantia')]
+
+        >>> tokenizar_montos("renta de 10 000 soles")
+        ([TokenMonto(valor=10000.0, moneda='soles', rol='renta')], 'soles')
+        >>> tokenizar_montos("S/ 1500 mensuales y 2 meses de garantía")
+        ([TokenMonto(valor=1500.0, moneda='soles', rol='renta')], 'soles')
+        >>> tokenizar_montos("US$ 800 por 12 meses/año")
+        ([TokenMonto(valor=800.0, moneda='dólares', rol=None)], 'dólares')
+    """
+    tokens = []
+    for m in _TOKEN.finditer(texto or ""):
+        tipo = "numero" if m.group("numero") else m.lastgroup
+        if tipo == "numero":
+            tokens.append((tipo, _valor(m)))
+        elif tipo == "moneda":
+            tokens.append((tipo, normalizar_moneda(m.group(0))))
+        else:
+            tokens.append((tipo, None))
+
+    montos = []
+    for i, (tipo, valor) in enumerate(tokens):
+        if tipo != "numero":
+            continue
+        anterior = tokens[i - 1] if i > 0 else (None, None)
+        siguiente = tokens[i + 1] if i + 1 < len(tokens) else (None, None)
+        if siguiente[0] in ("porcentaje", "tiempo"):
+            continue
+        if anterior[0] == "moneda":
+            moneda = anterior[1]
+        elif siguiente[0] == "moneda":
+            moneda = siguiente[1]
+        else:
+            moneda = None
+        montos.append(TokenMonto(valor, moneda, _rol(tokens, i)))
+
+    moneda_texto = next((valor for tipo, valor in tokens if tipo == "moneda"), "soles")
+    return montos, moneda_texto
+
+
+def primer_monto(montos, *roles):
+    """Primer token con alguno de los roles dados (None = sin pista), o None."""
+    return next((t for t in montos if not roles or t.rol in roles), None)
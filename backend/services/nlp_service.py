@@ -0,0 +1,299 @@
+# services/nlp_service.py
+"""
+Servicio NLP compartido (opcional).
+
+Un pequeño pool de procesos es el único que carga el modelo spaCy; los
+workers web le envían textos por un socket local (multiprocessing.connection)
+y reciben lemas y vectores. Las peticiones concurrentes de distintos
+workers se agrupan en lotes antes de pasar por nlp.pipe.
+
+Servidor:
+    NLP_SERVICE_AUTHKEY=<secreto> python -m services.nlp_service --workers 2
+
+Clientes (workers web):
+    NLP_SERVICE_ADDRESS=127.0.0.1:6010
+    NLP_SERVICE_AUTHKEY=<secreto>
+    NLP_SERVICE_TIMEOUT_S=5      # conexión y respuesta; si vence, se procesa en local
+
+multiprocessing.connection deserializa (pickle) lo que recibe, así que la
+clave compartida es obligatoria: sin NLP_SERVICE_AUTHKEY el servidor no
+arranca y los clientes no se conectan.
+"""
+import os
+import time
+import queue
+import socket
+import struct
+import argparse
+import threading
+from multiprocessing import Pool, AuthenticationError
+from multiprocessing.connection import Listener, Connection, deliver_challenge, answer_challenge
+
+AUTHKEY = os.getenv("NLP_SERVICE_AUTHKEY", "").encode() or None
+
+# Conexiones en espera de accept() (el valor por defecto de Listener es 1)
+BACKLOG = int(os.getenv("NLP_SERVICE_BACKLOG", "128"))
+
+# Cliente: tiempo máximo para conectar y para cada respuesta, y cuánto
+# tiempo se deja de usar el servicio tras un fallo
+TIMEOUT_S = float(os.getenv("NLP_SERVICE_TIMEOUT_S", "5"))
+REINTENTO_S = float(os.getenv("NLP_SERVICE_REINTENTO_S", "30"))
+
+# Agrupación de peticiones: tamaño máximo del lote y espera máxima para llenarlo
+LOTE_MAX_TEXTOS = int(os.getenv("NLP_SERVICE_LOTE_MAX", "128"))
+LOTE_ESPERA_S = float(os.getenv("NLP_SERVICE_LOTE_ESPERA_MS", "5")) / 1000
+
+def parse_address(address: str):
+    """'host:puerto' -> (host, puerto); cualquier otra cosa es la ruta de un socket unix."""
+    host, sep, puerto = address.rpartition(":")
+    if sep and puerto.isdigit():
+        return (host or "127.0.0.1", int(puerto))
+    return address
+
+
+class DocRemoto:
+    """
+    Resultado de un texto procesado por el servicio. Expone lo que usan
+    los servicios de la app (iterar tokens con .lemma_, len, .vector).
+    """
+
+    class Token:
+        __slots__ = ("lemma_",)
+
+        def __init__(self, lemma):
+            self.lemma_ = lemma
+
+    def __init__(self, lemas, vector):
+        self._tokens = [DocRemoto.Token(l) for l in lemas]
+        self.vector = vector
+
+    def __iter__(self):
+        return iter(self._tokens)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __getitem__(self, i):
+        return self._tokens[i]
+
+
+# ---------------------------------------------------------------------
+# PROCESOS DEL POOL (dueños del modelo)
+# ---------------------------------------------------------------------
+def _procesar_en_worker(textos):
+    from services.nlp_utils import get_nlp
+    nlp = get_nlp()
+    if not nlp:
+        return None
+    con_vectores = bool(nlp.vocab.vectors.shape[0])
+    return [
+        {
+            "lemas": [token.lemma_ for token in doc],
+            "vector": doc.vector.tolist() if con_vectores else None,
+        }
+        for doc in nlp.pipe(textos)
+    ]
+
+def _info_en_worker():
+    from services.nlp_utils import get_nlp
+    nlp = get_nlp()
+    return {
+        "disponible": nlp is not None,
+        "vectores": bool(nlp and nlp.vocab.vectors.shape[0]),
+    }
+
+
+# ---------------------------------------------------------------------
+# SERVIDOR
+# ---------------------------------------------------------------------
+class _Peticion:
+    __slots__ = ("textos", "resultado", "listo")
+
+    def __init__(self, textos):
+        self.textos = textos
+        self.resultado = None
+        self.listo = threading.Event()
+
+
+class ServidorNLP:
+    def __init__(self, address, workers: int = 2):
+        if not AUTHKEY:
+            raise RuntimeError("NLP_SERVICE_AUTHKEY no está definido; el servicio NLP no arranca sin clave.")
+        self.address = address
+        self.pool = Pool(processes=workers)
+        self.pendientes = queue.Queue()
+        self.info = self.pool.apply(_info_en_worker)
+
+    def _despachar(self):
+        """Agrupa las peticiones pendientes en lotes y los reparte al pool."""
+        while True:
+            lote = [self.pendientes.get()]
+            total = len(lote[0].textos)
+            while total < LOTE_MAX_TEXTOS:
+                try:
+                    peticion = self.pendientes.get(timeout=LOTE_ESPERA_S)
+                except queue.Empty:
+                    break
+                lote.append(peticion)
+                total += len(peticion.textos)
+
+            textos = [t for p in lote for t in p.textos]
+            self.pool.apply_async(
+                _procesar_en_worker, (textos,),
+                callback=lambda resultados, lote=lote: self._repartir(lote, resultados),
+                error_callback=lambda e, lote=lote: self._repartir(lote, None),
+            )
+
+    def _repartir(self, lote, resultados):
+        inicio = 0
+        for peticion in lote:
+            fin = inicio + len(peticion.textos)
+            peticion.resultado = resultados[inicio:fin] if resultados is not None else None
+            peticion.listo.set()
+            inicio = fin
+
+    def _atender(self, conexion):
+        try:
+            # El handshake se hace en el hilo de la conexión: un cliente lento
+            # o con otra clave no bloquea el accept() de los demás
+            deliver_challenge(conexion, AUTHKEY)
+            answer_challenge(conexion, AUTHKEY)
+        except (AuthenticationError, EOFError, OSError) as e:
+            print(f"⚠️ Servicio NLP: conexión rechazada en el handshake: {e!r}")
+            conexion.close()
+            return
+        try:
+            while True:
+                mensaje = conexion.recv()
+                if mensaje.get("op") == "info":
+                    conexion.send(self.info)
+                elif mensaje.get("op") == "procesar":
+                    peticion = _Peticion(mensaje["textos"])
+                    if peticion.textos:
+                        self.pendientes.put(peticion)
+                        peticion.listo.wait()
+                    else:
+                        peticion.resultado = []
+                    conexion.send(peticion.resultado)
+                else:
+                    conexion.send({"error": "Operación no soportada"})
+        except (EOFError, ConnectionError):
+            pass
+        finally:
+            conexion.close()
+
+    def servir(self):
+        threading.Thread(target=self._despachar, daemon=True).start()
+        # Sin authkey en el Listener: accept() solo acepta el socket y la
+        # autenticación la hace _atender
+        with Listener(self.address, backlog=BACKLOG) as listener:
+            print(f"Servicio NLP escuchando en {self.address} (modelo: {self.info})")
+            while True:
+                try:
+                    conexion = listener.accept()
+                except OSError as e:
+                    print(f"⚠️ Servicio NLP: error en accept(): {e!r}")
+                    continue
+                threading.Thread(target=self._atender, args=(conexion,), daemon=True).start()
+
+
+# ---------------------------------------------------------------------
+# CLIENTE (usado por nlp_utils cuando NLP_SERVICE_ADDRESS está definido)
+# ---------------------------------------------------------------------
+class ClienteNLP:
+    """
+    Una conexión por hilo, reabierta automáticamente si se cae.
+
+    Conexión, handshake y cada respuesta tienen un límite de TIMEOUT_S.
+    Si el servicio no responde a tiempo se devuelve None (nlp_utils
+    procesa entonces en local) y no se vuelve a intentar hasta pasados
+    REINTENTO_S, para no hacer esperar el timeout a cada petición.
+    """
+
+    def __init__(self, address):
+        self.address = parse_address(address)
+        self._local = threading.local()
+        self._info = None
+        self._caido_hasta = 0.0
+
+    def _conectar(self):
+        """Como multiprocessing.connection.Client, pero con timeout."""
+        if isinstance(self.address, tuple):
+            sock = socket.create_connection(self.address, timeout=TIMEOUT_S)
+        else:
+            sock = socket.socket(socket.AF_UNIX)
+            sock.settimeout(TIMEOUT_S)
+            sock.connect(self.address)
+        # Connection lee el descriptor en modo bloqueante: el límite de las
+        # lecturas (handshake incluido) lo pone SO_RCVTIMEO
+        sock.setblocking(True)
+        segundos = int(TIMEOUT_S)
+        sock.setsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVTIMEO,
+            struct.pack("ll", segundos, int((TIMEOUT_S - segundos) * 1e6)),
+        )
+        conexion = Connection(sock.detach())
+        try:
+            answer_challenge(conexion, AUTHKEY)
+            deliver_challenge(conexion, AUTHKEY)
+        except BaseException:
+            conexion.close()
+            raise
+        return conexion
+
+    def _pedir(self, mensaje):
+        if not AUTHKEY:
+            print("⚠️ NLP_SERVICE_AUTHKEY no está definido; no se usa el servicio NLP.")
+            return None
+        if time.monotonic() < self._caido_hasta:
+            return None
+        for intento in range(2):
+            conexion = getattr(self._local, "conexion", None)
+            reutilizada = conexion is not None
+            try:
+                if conexion is None:
+                    conexion = self._local.conexion = self._conectar()
+                conexion.send(mensaje)
+                if not conexion.poll(TIMEOUT_S):
+                    raise TimeoutError(f"sin respuesta en {TIMEOUT_S}s")
+                return conexion.recv()
+            except (EOFError, OSError, AuthenticationError) as e:
+                # Una respuesta que llegue tarde desincronizaría la conexión
+                if conexion is not None:
+                    conexion.close()
+                self._local.conexion = None
+                # Solo se reintenta si falló una conexión reutilizada (el
+                # servicio pudo reiniciarse); una conexión nueva no se repite
+                if intento or not reutilizada or isinstance(e, TimeoutError):
+                    self._caido_hasta = time.monotonic() + REINTENTO_S
+                    print(f"⚠️ Servicio NLP no disponible en {self.address}: {e!r}; se procesa en local.")
+                    return None
+        return None
+
+    def info(self):
+        if self._info is None:
+            self._info = self._pedir({"op": "info"})
+        return self._info or {"disponible": False, "vectores": False}
+
+    def procesar(self, textos):
+        resultados = self._pedir({"op": "procesar", "textos": list(textos)})
+        if resultados is None:
+            return None
+        return [DocRemoto(r["lemas"], _vector(r["vector"])) for r in resultados]
+
+
+def _vector(valores):
+    if valores is None:
+        return None
+    import numpy as np
+    return np.asarray(valores, dtype=np.float32)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Servicio NLP compartido")
+    arg_parser.add_argument("--address", default=os.getenv("NLP_SERVICE_ADDRESS", "127.0.0.1:6010"))
+    arg_parser.add_argument("--workers", type=int, default=2)
+    args = arg_parser.parse_args()
+    if not AUTHKEY:
+        arg_parser.error("defina NLP_SERVICE_AUTHKEY (clave compartida con los workers web)")
+    ServidorNLP(parse_address(args.address), workers=args.workers).servir()
@@ -1,25 +1,128 @@
 # services/nlp_utils.py
-import spacy
+import os
+import time
+import threading
+import unicodedata
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # Nombre del modelo que usas en todo el proyecto
-SPACY_MODEL = "es_core_news_md"
+SPACY_MODEL = os.getenv("SPACY_MODEL", "es_core_news_md")
+
+# Solo usamos lemas: el parser y el NER no se cargan
+SPACY_EXCLUDE = [c.strip() for c in os.getenv("SPACY_EXCLUDE", "parser,ner,senter").split(",") if c.strip()]
+
+# Procesamiento por lotes (nlp.pipe)
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "64"))
+NLP_N_PROCESS = int(os.getenv("NLP_N_PROCESS", "1"))
+
+# Si se define, lemas y vectores se piden al servicio NLP compartido
+# (services/nlp_service.py) en lugar de cargar el modelo en este proceso
+NLP_SERVICE_ADDRESS = os.getenv("NLP_SERVICE_ADDRESS")
 
 # Variable global para mantener el modelo cargado
 _nlp = None
+_nlp_no_disponible = False
+_nlp_lock = threading.Lock()
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas y sin tildes, para comparar 'Prestación' con 'prestacion'."""
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    descompuesto = unicodedata.normalize("NFD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+def rss_mb():
+    """Memoria residente máxima del proceso en MB (0 si no se puede medir)."""
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
 def get_nlp():
     """
     Devuelve una instancia única del modelo spaCy en español.
-    Si aún no se ha cargado, la carga y la reutiliza en todo el proyecto.
+    Se carga en el primer uso (no al importar) y solo con los componentes
+    necesarios para lematizar; luego se reutiliza en todo el proyecto.
     """
-    global _nlp
-    if _nlp is None:
+    global _nlp, _nlp_no_disponible
+    if _nlp is not None or _nlp_no_disponible:
+        return _nlp
+
+    with _nlp_lock:
+        if _nlp is not None or _nlp_no_disponible:
+            return _nlp
+
+        inicio = time.perf_counter()
+        rss_inicio = rss_mb()
         try:
-            _nlp = spacy.load(SPACY_MODEL)
-            print(f"Modelo spaCy '{SPACY_MODEL}' cargado correctamente.")
-        except OSError:
+            import spacy
+            _nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+            print(
+                f"Modelo spaCy '{SPACY_MODEL}' cargado correctamente en "
+                f"{time.perf_counter() - inicio:.2f}s "
+                f"(componentes: {', '.join(_nlp.pipe_names)}; "
+                f"RSS {rss_inicio:.0f} -> {rss_mb():.0f} MB)."
+            )
+        except (ImportError, OSError):
             print(f"Error: Modelo '{SPACY_MODEL}' no encontrado.")
             print("Por favor, instala el modelo con:")
             print(f"    python -m spacy download {SPACY_MODEL}")
             _nlp = None
+            _nlp_no_disponible = True
     return _nlp
+
+_cliente = None
+
+def _get_cliente():
+    global _cliente
+    if _cliente is None:
+        from services.nlp_service import ClienteNLP
+        _cliente = ClienteNLP(NLP_SERVICE_ADDRESS)
+    return _cliente
+
+def warmup_nlp():
+    """Carga el modelo por adelantado (p. ej. al arrancar el worker)."""
+    if NLP_SERVICE_ADDRESS:
+        return _get_cliente().info()["disponible"]
+    return get_nlp() is not None
+
+def tiene_vectores() -> bool:
+    """Indica si el modelo (local o del servicio) trae vectores de palabras."""
+    if NLP_SERVICE_ADDRESS:
+        return _get_cliente().info()["vectores"]
+    nlp = get_nlp()
+    return bool(nlp and nlp.vocab.vectors.shape[0])
+
+def procesar_lote(textos, batch_size: int = None, n_process: int = None):
+    """
+    Procesa una lista de textos en una sola pasada de nlp.pipe.
+    Devuelve la lista de Doc en el mismo orden, o None si no hay modelo.
+    Con NLP_SERVICE_ADDRESS devuelve DocRemoto (lemas y vector); si el
+    servicio no responde a tiempo, procesa con el modelo local.
+    """
+    textos = list(textos)
+    if NLP_SERVICE_ADDRESS:
+        docs = _get_cliente().procesar(textos)
+        if docs is not None:
+            return docs
+    nlp = get_nlp()
+    if not nlp:
+        return None
+    if not textos:
+        return []
+    n_process = n_process or NLP_N_PROCESS
+    # Con pocos textos no compensa arrancar procesos hijos
+    if n_process > 1 and len(textos) < (batch_size or NLP_BATCH_SIZE):
+        n_process = 1
+    return list(nlp.pipe(textos, batch_size=batch_size or NLP_BATCH_SIZE, n_process=n_process))
+
+def lematizar_lote(textos, **kwargs):
+    """Devuelve, para cada texto, sus lemas unidos por espacios."""
+    docs = procesar_lote(textos, **kwargs)
+    if docs is None:
+        return None
+    return [" ".join(token.lemma_ for token in doc) for doc in docs]
@@ -0,0 +1,53 @@
+# services/patrones.py
+"""
+Reglas de extracción de data_processors, compiladas una sola vez al
+importar el módulo, y helpers que evalúan cada búsqueda una sola vez
+(en vez de "re.search(...).group(1) if re.search(...) else ...").
+"""
+import re
+
+# --- Documentos de identidad ---
+DNI = re.compile(r"(\d{8})")
+DNI_AISLADO = re.compile(r"\b(\d{8})\b")
+RUC = re.compile(r"(\d{11})")
+PUNTUACION_FINAL = re.compile(r"[\.,;]$")
+
+# --- Porcentajes (los montos los tokeniza services.montos) ---
+PORCENTAJE = re.compile(r"(\d+[\d\.]*)")
+
+# --- Fechas y lugar ---
+SEPARADOR_RANGO = re.compile(r"\s+(hasta|al)\s+", re.IGNORECASE)
+CONECTORES_LUGAR = re.compile(r"^(en|el|para|del)\s*|[\.,;]$")
+
+# --- Arrendamiento ---
+PERSONA_DNI_DOMICILIO = re.compile(r"(.+?),\s*DNI\s*(\d+).+domicilio\s*en\s*(.+)", re.IGNORECASE)
+INMUEBLE_DIRECCION = re.compile(r"(Av\.|Jr\.|Calle|Mz|Urbanización|[A-Za-z\s]+)\s+[^\d]*\d*")
+INMUEBLE_DISTRITO = re.compile(r"distrito\s+([A-Za-záéíóúñ\s]+)", re.IGNORECASE)
+INMUEBLE_PROVINCIA = re.compile(r"provincia\s+([A-Za-záéíóúñ\s]+)", re.IGNORECASE)
+INMUEBLE_DEPARTAMENTO = re.compile(r"departamento\s+([A-Za-záéíóúñ\s]+)", re.IGNORECASE)
+INMUEBLE_PARTIDA = re.compile(r"partida\s*(\d+)", re.IGNORECASE)
+INMUEBLE_ZONA_REGISTRAL = re.compile(r"zona\s+registral\s+(.+)", re.IGNORECASE)
+PLAZO_ARRENDAMIENTO = re.compile(
+    r"(\d+)\s*años?.*?(\d{1,2}/\d{1,2}/\d{4}).*?(\d{1,2}/\d{1,2}/\d{4}).*?(\d+)\s*d[ií]as.*?(\d+)\s*mes",
+    re.IGNORECASE
+)
+DIA_ORDINAL = re.compile(r"(primer|segundo|tercer|cuarto|quinto|sexto|s[eé]ptimo)", re.IGNORECASE)
+MESES_CANTIDAD = re.compile(r"(\d+)\s*mes", re.IGNORECASE)
+TIPO_CUENTA = re.compile(r"(ahorros|corriente)", re.IGNORECASE)
+NUMERO_CUENTA_GUIONES = re.compile(r"(\d[\d-]+)")
+BANCO = re.compile(r"(BCP|BBVA|INTERBANK|SCOTIABANK|BANCO|FINANCIERA)\s*[A-Z]*", re.IGNORECASE)
+
+# --- Pago ---
+DIA_PAGO = re.compile(r"\b(\d{1,2})\b\s*(?:de\s*cada\s*mes|día|dia)?")
+NUMERO_CUENTA = re.compile(r"(\d{8,20})")
+
+# --- Direcciones ---
+PALABRA_EN = re.compile(r"\b[Ee]n\b")
+ESPACIOS = re.compile(r"\s+")
+NOMBRE_PROPIO = re.compile(r"^[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+$")
+
+
+def grupo(patron, texto, n=1, default=""):
+    """Grupo n de la primera coincidencia, o default si no hay coincidencia."""
+    m = patron.search(texto or "")
+    return m.group(n) if m else default
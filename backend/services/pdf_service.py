@@ -0,0 +1,126 @@
+# services/pdf_service.py
+"""
+Generación del PDF del contrato formalizado, fuera del request.
+
+El HTML se renderiza con WeasyPrint (librería local, sin servicios
+externos) en un pool de procesos aparte, así la conversión no bloquea
+ni los hilos ni el GIL del worker web. Al terminar, un callback en el
+proceso web guarda la URL en Contrato.archivo_original_url y el estado
+del trabajo en Contrato.metadatos["pdf"]:
+
+    {"estado": "pendiente" | "listo" | "error", "actualizado": iso, "error": str}
+
+El PDF se escribe en el almacén por contenido (services.document_store),
+calculando su SHA-256 mientras WeasyPrint lo genera, y se registra la
+Evidencia "Hash SHA-256" del contrato. Las fechas de creación y
+modificación del PDF se omiten, así el mismo HTML da los mismos bytes
+(y el mismo digest) con la misma versión de WeasyPrint y las mismas
+fuentes.
+"""
+import os
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+TEMPLATES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "templates"))
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_LISTO = "listo"
+ESTADO_ERROR = "error"
+
+
+# ---------------------------------------------------------------------
+# PROCESO DEL POOL
+# ---------------------------------------------------------------------
+def _renderizar_pdf(html: str):
+    """Convierte el HTML a PDF directamente en el almacén; retorna el Objeto guardado."""
+    from weasyprint import HTML
+    from services.document_store import EscritorObjeto
+
+    documento = HTML(string=html, base_url=TEMPLATES_DIR).render()
+    # Sin /CreationDate ni /ModDate (p. ej. de un <meta name="dcterms.created">)
+    documento.metadata.created = documento.metadata.modified = None
+    with EscritorObjeto(".pdf") as escritor:
+        documento.write_pdf(escritor)
+    return escritor.objeto
+
+
+# ---------------------------------------------------------------------
+# PROCESO WEB
+# ---------------------------------------------------------------------
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    # "spawn": el hijo no hereda hilos, conexiones a la BBDD ni el modelo spaCy
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def _estado(estado, **extra):
+    return dict(extra, estado=estado, actualizado=datetime.utcnow().isoformat())
+
+
+def marcar_pdf_pendiente(contrato):
+    """Registra el trabajo como pendiente; se guarda con la transacción del llamador."""
+    contrato.metadatos = dict(contrato.metadatos or {}, pdf=_estado(ESTADO_PENDIENTE))
+
+
+def marcar_pdf_error(contrato, error):
+    contrato.metadatos["pdf"] = _estado(ESTADO_ERROR, error=str(error))
+
+
+def encolar_pdf_contrato(contrato, html: str):
+    """
+    Encola la conversión a PDF del HTML del contrato. Llamar después del
+    commit (el callback lee el contrato de la BBDD) y con un contexto de
+    aplicación Flask activo.
+    """
+    from flask import current_app
+
+    app = current_app._get_current_object()
+    contrato_id = contrato.id
+    futuro = _get_executor().submit(_renderizar_pdf, html)
+    futuro.add_done_callback(lambda f: _finalizar(app, contrato_id, f))
+
+
+def _finalizar(app, contrato_id, futuro):
+    """Callback en el proceso web: guarda la URL o el error en el contrato."""
+    from database import db
+    from models import Contrato
+    from services.document_store import registrar_evidencia
+
+    with app.app_context():
+        try:
+            contrato = Contrato.query.get(contrato_id)
+            if not contrato:
+                return
+            error = futuro.exception()
+            if error:
+                app.logger.error("Error generando el PDF del contrato %s: %s", contrato_id, error)
+                marcar_pdf_error(contrato, error)
+            else:
+                objeto = futuro.result()
+                contrato.archivo_original_url = objeto.url
+                contrato.metadatos["pdf"] = _estado(ESTADO_LISTO, sha256=objeto.digest)
+                registrar_evidencia(contrato_id, objeto, "pdf")
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            app.logger.exception("No se pudo registrar el PDF del contrato %s", contrato_id)
+
+
+def estado_pdf(contrato) -> dict:
+    """Estado del trabajo de PDF de un contrato, para la API."""
+    info = dict((contrato.metadatos or {}).get("pdf") or {"estado": None})
+    info["url"] = contrato.archivo_original_url
+    return info
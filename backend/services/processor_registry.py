@@ -0,0 +1,142 @@
+# services/processor_registry.py
+"""
+Registro de procesadores de datos con metadatos.
+
+Cada tipo_dato se registra con su función y con:
+  - puro: el resultado depende solo del texto crudo (regex, montos...).
+    Los puros se memorizan por (tipo_dato, raw_value) en una caché LRU
+    acotada, así recargar la vista previa no repite el trabajo.
+  - costo: "bajo" (CPU local) o "red" (I/O externo); orienta el tiempo
+    límite por defecto en la ejecución concurrente.
+  - ttl: segundos de validez en caché (None = sin vencimiento). Para
+    procesadores que dependen de la fecha actual (fechas sin año).
+  - timeout / fallback: presupuesto de tiempo y valor degradado.
+  - version: se incrementa cuando cambia lo que devuelve el procesador;
+    forma parte de la huella de la vista previa incremental, así los
+    chats con resultados ya guardados se reprocesan con la versión nueva.
+"""
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+CACHE_MAX = int(os.getenv("PROCESADORES_CACHE_MAX", "1024"))
+
+COSTO_BAJO = "bajo"
+COSTO_RED = "red"
+
+
+class Procesador:
+    __slots__ = ("func", "puro", "costo", "ttl", "timeout", "fallback", "version")
+
+    def __init__(self, func, puro=True, costo=COSTO_BAJO, ttl=None, timeout=None, fallback=None, version=1):
+        self.func = func
+        self.puro = puro
+        self.costo = costo
+        self.ttl = ttl
+        self.timeout = timeout
+        self.fallback = fallback
+        self.version = version
+
+
+class RegistroProcesadores:
+    """
+    Se usa como el dict PROCESSOR_REGISTRY de antes (get, in, [] devuelven
+    la función) y además permite ejecutar con memorización.
+    """
+
+    def __init__(self, max_entradas: int = CACHE_MAX):
+        self._procesadores = {}
+        self._cache = OrderedDict()
+        self._max = max_entradas
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expirados": 0, "no_cacheables": 0, "desalojos": 0}
+
+    def registrar(self, tipo_dato, func, **metadatos):
+        self._procesadores[tipo_dato] = Procesador(func, **metadatos)
+        return func
+
+    # --- Interfaz de dict (compatibilidad) ---
+
+    def get(self, tipo_dato, default=None):
+        procesador = self._procesadores.get(tipo_dato)
+        return procesador.func if procesador else default
+
+    def __getitem__(self, tipo_dato):
+        return self._procesadores[tipo_dato].func
+
+    def __contains__(self, tipo_dato):
+        return tipo_dato in self._procesadores
+
+    def __iter__(self):
+        return iter(self._procesadores)
+
+    def __len__(self):
+        return len(self._procesadores)
+
+    def metadatos(self, tipo_dato) -> Procesador | None:
+        return self._procesadores.get(tipo_dato)
+
+    # --- Memorización ---
+
+    def en_cache(self, tipo_dato, raw_value):
+        """(encontrado, resultado) sin ejecutar el procesador."""
+        procesador = self._procesadores.get(tipo_dato)
+        if not procesador or not procesador.puro:
+            return False, None
+        try:
+            clave = (tipo_dato, raw_value)
+            hash(clave)
+        except TypeError:
+            return False, None
+
+        with self._lock:
+            entrada = self._cache.get(clave)
+            if entrada is None:
+                return False, None
+            resultado, expira = entrada
+            if expira is not None and expira < time.monotonic():
+                del self._cache[clave]
+                self._stats["expirados"] += 1
+                return False, None
+            self._cache.move_to_end(clave)
+            self._stats["hits"] += 1
+        # Copia: los llamadores modifican el resultado (p. ej. "tratamiento")
+        return True, copy.deepcopy(resultado)
+
+    def ejecutar(self, tipo_dato, raw_value):
+        """Ejecuta el procesador, usando y llenando la caché si es puro."""
+        procesador = self._procesadores[tipo_dato]
+        encontrado, resultado = self.en_cache(tipo_dato, raw_value)
+        if encontrado:
+            return resultado
+
+        resultado = procesador.func(raw_value)
+        if not procesador.puro:
+            return resultado
+        try:
+            clave = (tipo_dato, raw_value)
+            hash(clave)
+        except TypeError:
+            with self._lock:
+                self._stats["no_cacheables"] += 1
+            return resultado
+
+        expira = time.monotonic() + procesador.ttl if procesador.ttl else None
+        with self._lock:
+            self._stats["misses"] += 1
+            self._cache[clave] = (copy.deepcopy(resultado), expira)
+            self._cache.move_to_end(clave)
+            while len(self._cache) > self._max:
+                self._cache.popitem(last=False)
+                self._stats["desalojos"] += 1
+        return resultado
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entradas=len(self._cache), max_entradas=self._max)
+
+    def limpiar_cache(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,179 @@
+# services/ubigeo.py
+"""
+Gazetteer local de ubigeos del Perú (departamentos, provincias y distritos).
+
+Se carga una vez desde data/ubigeo_peru.csv (columnas ubigeo, departamento,
+provincia, distrito; el mismo formato de la tabla del INEI) en índices en
+memoria. Permite resolver las divisiones administrativas de una dirección
+sin red: búsqueda exacta sin tildes, por prefijo y aproximada.
+"""
+import os
+import re
+import csv
+import bisect
+import difflib
+import threading
+from services.nlp_utils import normalizar_texto
+
+UBIGEO_PATH = os.getenv(
+    "UBIGEO_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "ubigeo_peru.csv")
+)
+
+NIVELES = ("departamento", "provincia", "distrito")
+
+# Similitud mínima (difflib) para aceptar un nombre mal escrito
+UMBRAL_APROXIMADO = 0.85
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+class GazetteerUbigeo:
+    def __init__(self, filas):
+        # nivel -> nombre normalizado -> [entradas]
+        self._por_nombre = {nivel: {} for nivel in NIVELES}
+        vistos = set()
+        for fila in filas:
+            dep, prov, dist = fila["departamento"], fila["provincia"], fila["distrito"]
+            codigo = fila["ubigeo"]
+            entradas = (
+                ("departamento", dep, {"departamento": dep, "ubigeo": codigo[:2]}),
+                ("provincia", prov, {"provincia": prov, "departamento": dep, "ubigeo": codigo[:4]}),
+                ("distrito", dist, {"distrito": dist, "provincia": prov, "departamento": dep, "ubigeo": codigo}),
+            )
+            for nivel, nombre, entrada in entradas:
+                if (nivel, entrada["ubigeo"]) in vistos:
+                    continue
+                vistos.add((nivel, entrada["ubigeo"]))
+                self._por_nombre[nivel].setdefault(normalizar_texto(nombre), []).append(entrada)
+
+        self._nombres = sorted({n for indice in self._por_nombre.values() for n in indice})
+        self._max_palabras = max((len(n.split()) for n in self._nombres), default=1)
+        self._por_inicial = {}
+        for nombre in self._nombres:
+            self._por_inicial.setdefault(nombre[:1], []).append(nombre)
+
+    @classmethod
+    def desde_csv(cls, ruta: str = UBIGEO_PATH):
+        with open(ruta, encoding="utf-8", newline="") as f:
+            return cls(list(csv.DictReader(f)))
+
+    # --- Búsquedas puntuales ---
+
+    def buscar(self, nombre: str, nivel: str = None) -> list:
+        """Entradas cuyo nombre coincide exactamente (sin tildes ni mayúsculas)."""
+        clave = normalizar_texto(nombre).strip()
+        niveles = (nivel,) if nivel else NIVELES
+        return [dict(e, nivel=n) for n in niveles for e in self._por_nombre[n].get(clave, [])]
+
+    def buscar_prefijo(self, prefijo: str, limite: int = 10) -> list:
+        """Nombres normalizados que empiezan por 'prefijo' (orden alfabético)."""
+        clave = normalizar_texto(prefijo).strip()
+        inicio = bisect.bisect_left(self._nombres, clave)
+        resultado = []
+        for nombre in self._nombres[inicio:]:
+            if not nombre.startswith(clave) or len(resultado) >= limite:
+                break
+            resultado.append(nombre)
+        return resultado
+
+    def buscar_aproximado(self, nombre: str) -> str | None:
+        """Nombre normalizado más parecido (para errores de tipeo), o None."""
+        clave = normalizar_texto(nombre).strip()
+        candidatos = self._por_inicial.get(clave[:1], [])
+        coincidencias = difflib.get_close_matches(clave, candidatos, n=1, cutoff=UMBRAL_APROXIMADO)
+        return coincidencias[0] if coincidencias else None
+
+    # --- Resolución de una dirección completa ---
+
+    def _menciones(self, tokens):
+        """
+        Recorre el texto buscando en cada posición el nombre más largo que
+        coincida y devuelve {nombre: {posiciones}}. Las palabras sueltas que
+        no coinciden se prueban con búsqueda aproximada.
+        """
+        menciones = {}
+        i = 0
+        while i < len(tokens):
+            for n in range(min(self._max_palabras, len(tokens) - i), 0, -1):
+                frase = " ".join(tokens[i:i + n])
+                if any(frase in self._por_nombre[nivel] for nivel in NIVELES):
+                    menciones.setdefault(frase, set()).add(i)
+                    i += n
+                    break
+            else:
+                token = tokens[i]
+                if len(token) >= 5 and not token.isdigit():
+                    aproximado = self.buscar_aproximado(token)
+                    if aproximado:
+                        menciones.setdefault(aproximado, set()).add(i)
+                i += 1
+        return menciones
+
+    def resolver(self, texto: str) -> dict | None:
+        """
+        Identifica distrito, provincia y departamento mencionados en el texto,
+        eligiendo la combinación jerárquicamente más consistente: un nivel
+        superior solo confirma si aparece en otra posición del texto (así
+        "Piura" sola no se confirma a sí misma). A igualdad, gana la mención
+        más tardía, porque las divisiones suelen ir al final.
+        Retorna None si no se reconoce ninguna división.
+
+        "completo" solo se marca cuando el distrito está confirmado por su
+        provincia o departamento en otra parte del texto: un nombre suelto
+        ("Santa Rosa", "Miraflores") puede ser una urbanización o un distrito
+        homónimo de otra provincia que no está en el CSV, así que queda como
+        pista ("confirmado": False) y no sustituye a la geocodificación.
+        """
+        tokens = _TOKEN.findall(normalizar_texto(texto or ""))
+        menciones = self._menciones(tokens)
+
+        def confirmado(nombre, posicion):
+            return bool(menciones.get(normalizar_texto(nombre), set()) - {posicion})
+
+        mejor, mejor_clave = None, None
+        for nivel in ("distrito", "provincia", "departamento"):
+            for nombre, posiciones in menciones.items():
+                for entrada in self._por_nombre[nivel].get(nombre, []):
+                    for posicion in posiciones:
+                        puntaje = 1
+                        if nivel == "distrito" and confirmado(entrada["provincia"], posicion):
+                            puntaje += 2
+                        if nivel != "departamento" and confirmado(entrada["departamento"], posicion):
+                            puntaje += 2
+                        clave = (puntaje, posicion)
+                        if mejor_clave is None or clave > mejor_clave:
+                            mejor, mejor_clave = dict(entrada, nivel=nivel), clave
+            if mejor is not None:
+                break
+
+        if mejor is None:
+            return None
+
+        # Sin provincia ni departamento que lo respalden, el nombre es solo una pista
+        respaldado = mejor_clave[0] > 1
+        # Un nombre repetido en varias provincias sin ningún otro dato que lo confirme
+        homonimos = self._por_nombre[mejor["nivel"]][normalizar_texto(mejor[mejor["nivel"]])]
+        ambiguo = not respaldado and len(homonimos) > 1
+        return {
+            "distrito": mejor.get("distrito", ""),
+            "provincia": mejor.get("provincia", ""),
+            "departamento": mejor.get("departamento", ""),
+            "ubigeo": mejor["ubigeo"],
+            "completo": mejor["nivel"] == "distrito" and respaldado,
+            "confirmado": respaldado,
+            "ambiguo": ambiguo,
+        }
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """Devuelve el gazetteer cargado (una sola vez por proceso)."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = GazetteerUbigeo.desde_csv()
+    return _gazetteer
@@ -58,6 +58,7 @@ export async function sendChatMessageStreaming(
   const response = await fetch(`${API_BASE_URL}/chat/streaming`, {
     method: "POST",
     headers: {
+      Accept: "text/event-stream",
       "Content-Type": "application/json",
       Authorization: `Bearer ${apiKey}`,
     },
@@ -73,6 +74,12 @@ export async function sendChatMessageStreaming(
   const reader = response.body.getReader();
   const decoder = new TextDecoder();
 
+  const contentType = response.headers.get("Content-Type") || "";
+  if (contentType.includes("text/event-stream")) {
+    await readServerSentEvents(reader, decoder, onChunk);
+    return;
+  }
+
   while (true) {
     const { done, value } = await reader.read();
     if (done) break;
@@ -90,6 +97,41 @@ export async function sendChatMessageStreaming(
   }
 }
 
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Lee eventos SSE del chat y aplica en el cliente la pausa sugerida por el servidor
+async function readServerSentEvents(reader, decoder, onChunk) {
+  let buffer = "";
+  let pausaMs = 0;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const events = buffer.split("\n\n");
+    buffer = events.pop();
+
+    for (const raw of events) {
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === "inicio") {
+        pausaMs = payload.pausa_ms || 0;
+      } else if (event === "message") {
+        if (onChunk) onChunk(payload);
+        if (pausaMs) await sleep(pausaMs);
+      }
+    }
+  }
+}
+
 export async function getContractDocument(chatId) {
   const response = await fetch(
     `${API_BASE_URL}/chat/documento?chat_id=${chatId}`